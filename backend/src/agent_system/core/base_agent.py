@@ -213,14 +213,22 @@ class BaseAgent(ABC):
         if data:
             update_data.update(data)
             
-        # Send the update
+        # Send the update, supporting both sync and async callbacks
         try:
-            await stream_callback(
-                agent_id=self.agent_id,
-                message_type="agent_update",
-                content=status,
-                data=update_data
-            )
+            if asyncio.iscoroutinefunction(stream_callback):
+                await stream_callback(
+                    agent_id=self.agent_id,
+                    message_type="agent_update",
+                    content=status,
+                    data=update_data
+                )
+            else:
+                stream_callback(
+                    agent_id=self.agent_id,
+                    message_type="agent_update",
+                    content=status,
+                    data=update_data
+                )
         except Exception as e:
             logger.error(f"Error sending status update: {str(e)}")
 
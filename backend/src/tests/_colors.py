@@ -0,0 +1,26 @@
+"""
+ANSI color codes shared by the connection test scripts.
+
+The codes are empty strings when stdout isn't a terminal, so redirected output
+stays free of escape sequences.
+"""
+import sys
+
+# Add some color to output when writing to a terminal
+if sys.stdout.isatty():
+    # Only legacy Windows consoles need colorama to translate ANSI codes
+    if sys.platform == "win32":
+        try:
+            import colorama
+            colorama.init()
+        except ImportError:
+            pass
+    GREEN = "\x1b[32m"
+    RED = "\x1b[31m"
+    YELLOW = "\x1b[33m"
+    RESET = "\x1b[0m"
+else:
+    GREEN = ""
+    RED = ""
+    YELLOW = ""
+    RESET = ""
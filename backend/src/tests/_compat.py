@@ -0,0 +1,70 @@
+"""
+Optional speedups shared by the test scripts.
+
+uvloop, orjson and h2 (for HTTP/2) are used when they're installed. Without them
+the helpers fall back to asyncio.run, the stdlib json module and HTTP/1.1. The
+JSON helpers behave the same either way: non-string dict keys are accepted and
+unknown types are stringified.
+"""
+import json
+import mmap
+import asyncio
+import importlib.util
+from typing import Any
+
+# Use orjson for faster (de)serialization when available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Prefer uvloop's faster event loop when it's installed
+try:
+    import uvloop
+    run_async = uvloop.run
+except ImportError:
+    run_async = asyncio.run
+
+# HTTP/2 lets concurrent requests share one connection; httpx needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# orjson rejects non-string dict keys by default, unlike json.dumps
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+def loads_json(data) -> Any:
+    """
+    Parse JSON text or bytes, preferring orjson when installed.
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    catch the stdlib exception either way.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load_json_file(path) -> Any:
+    """Parse a JSON file, memory-mapping it for orjson when that's installed."""
+    if orjson is None:
+        with open(path, 'r') as f:
+            return json.load(f)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        with memoryview(buf) as view:
+            return orjson.loads(view)
+
+def dumps_json(data) -> bytes:
+    """Serialize data to UTF-8 JSON bytes, e.g. for a request body."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS)
+    return json.dumps(data, default=str).encode("utf-8")
+
+def dumps_compact(data) -> str:
+    """Serialize data as single-line JSON."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+def dumps_pretty(data) -> str:
+    """Serialize data as indented JSON."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2, default=str)
@@ -0,0 +1,75 @@
+"""
+Markdown report helpers shared by the query generation test scripts.
+
+The hybrid, ICL and feedback query tests write the same per-query sections; the
+templates here are parsed once and filled in with str.format_map for every result.
+"""
+
+# Section for a query generated by an agent that reports which approach it used;
+# {cached} marks results reused from the query cache rather than freshly generated
+APPROACH_RESULT_TEMPLATE = (
+    "## Query {number}: {query}{cached}\n\n"
+    "**Approach Used:** {approach}\n\n"
+    "**Generated Cypher Query:**\n\n"
+    "```cypher\n"
+    "{generated_query}"
+    "\n```\n\n"
+    "---\n\n"
+)
+
+# Section for a query that also reports how many generation attempts it took
+ATTEMPTS_RESULT_TEMPLATE = (
+    "## Query {number}: {query}\n\n"
+    "**Approach Used:** {approach}\n\n"
+    "**Attempts Required:** {attempts}\n\n"
+    "**Generated Cypher Query:**\n\n"
+    "```cypher\n"
+    "{generated_query}"
+    "\n```\n\n"
+    "---\n\n"
+)
+
+# Section for a generated query without approach information
+RESULT_TEMPLATE = (
+    "## Query {number}: {query}{cached}\n\n"
+    "**Generated Cypher Query:**\n\n"
+    "```cypher\n"
+    "{generated_query}"
+    "\n```\n\n"
+    "---\n\n"
+)
+
+# Section for a query whose test raised an error
+ERROR_RESULT_TEMPLATE = (
+    "## Query {number}: {query}\n\n"
+    "**Error:** {error}\n\n"
+    "---\n\n"
+)
+
+def format_result(index: int, result: dict, template: str = RESULT_TEMPLATE) -> str:
+    """
+    Render a single query result as a markdown section.
+
+    Args:
+        index: Zero-based position of the query in the test run
+        result: Result dictionary with the query and either its output or an error,
+            flagged with "cached" when it came from the query cache
+        template: Template used for successful results
+
+    Returns:
+        Markdown section for the result
+    """
+    if "error" in result:
+        return ERROR_RESULT_TEMPLATE.format_map({
+            "number": index + 1,
+            "query": result["query"],
+            "error": result["error"]
+        })
+    return template.format_map({
+        "number": index + 1,
+        "query": result["query"],
+        "cached": " (cached)" if result.get("cached") else "",
+        "approach": result.get("approach", "unknown"),
+        "attempts": result.get("attempts", 0),
+        "generated_query": result.get("generated_query", "No query generated")
+    })
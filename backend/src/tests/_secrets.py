@@ -0,0 +1,14 @@
+"""
+Helpers for logging credentials used by the test scripts without exposing them.
+"""
+
+def mask_api_key(api_key: str) -> str:
+    """
+    Mask all but the first and last four characters of an API key.
+
+    Keys of eight characters or fewer would be shown in full that way, so they
+    are masked completely.
+    """
+    if len(api_key) <= 8:
+        return "*" * len(api_key)
+    return f"{api_key[:4]}{'*' * (len(api_key) - 8)}{api_key[-4:]}"
@@ -8,6 +8,7 @@ import os
 import json
 import logging
 from datetime import datetime
+from pathlib import Path
 
 # Configure logging
 logging.basicConfig(
@@ -65,10 +66,10 @@ async def test_dengue_data_tool():
             logger.info(f"Historical points: {len(combined_data.get('historical_data', []))}")
             logger.info(f"Prediction points: {len(combined_data.get('predicted_data', []))}")
             
-            # Save the data to a file for inspection
-            with open(f"dengue_data_{country}.json", "w") as f:
-                json.dump(combined_data, f, indent=2)
-                logger.info(f"Saved combined data to dengue_data_{country}.json")
+            # Save the data to a file for inspection without blocking the event loop
+            output_file = Path(f"dengue_data_{country}.json")
+            await asyncio.to_thread(output_file.write_text, json.dumps(combined_data, indent=2))
+            logger.info(f"Saved combined data to {output_file}")
         except Exception as e:
             logger.error(f"Error retrieving combined data for {country}: {str(e)}")
         
@@ -8,9 +8,16 @@ import os
 import json
 import asyncio
 import logging
+import operator
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 from src.agent_system.rag_system.enhancement.dengue_data_visualization_agent import DengueDataVisualizationAgent
 from src.agent_system.core.message import Message, MessageRole
 
@@ -18,23 +25,65 @@ from src.agent_system.core.message import Message, MessageRole
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Set COMPRESS_ARTIFACTS=1 to write zstd-compressed reports (.md.zst) for large runs
+COMPRESS_ARTIFACTS = os.getenv("COMPRESS_ARTIFACTS", "").lower() in ("1", "true", "yes")
+
+# Defaults and accessor used to unpack each country record in a single lookup
+COUNTRY_DEFAULTS = {
+    "country": "Unknown",
+    "api_country": "Unknown",
+    "historical_data": [],
+    "predicted_data": []
+}
+_unpack_country = operator.itemgetter("country", "api_country", "historical_data", "predicted_data")
+
+# Report templates reused for every country / list item
+COUNTRY_TEMPLATE = (
+    "### {country} (API Source: {api_country})\n\n"
+    "Historical data points: {h_len}\n\n"
+)
+PREDICTED_COUNT_TEMPLATE = "Predicted data points: {p_len}\n\n"
+SAMPLE_TEMPLATE = "Sample {kind} data:\n```json\n{sample}\n```\n\n"
+BULLET_TEMPLATE = "- {item}\n"
+SUMMARY_TEMPLATE = "#### {country}\n\n{summary}\n\n"
+
+# Visualization agent configuration
+AGENT_CONFIG = {
+    "agent_id": "dengue_data_viz_test",
+    "model_config": {
+        "model_type": "instruct",
+        "max_tokens": 512,
+        "temperature": 0.2
+    },
+    # By default, the agent will use the URL from the DENGUE_DATA_URL env var or the default URL
+    # defined in DengueDataTool if neither is provided here
+}
+
+@lru_cache(maxsize=1)
+def _visualization_agent():
+    """Build the visualization agent once and reuse it across runs."""
+    return DengueDataVisualizationAgent(agent_id="dengue_data_viz_test", config=AGENT_CONFIG)
+
+def _write_report(output_file: Path, content: str) -> Path:
+    """Write a report to disk, zstd-compressing it when COMPRESS_ARTIFACTS is enabled."""
+    if COMPRESS_ARTIFACTS:
+        if zstandard is None:
+            logger.warning("COMPRESS_ARTIFACTS is set but zstandard is not installed. Run: pip install zstandard")
+        else:
+            compressed_file = output_file.with_suffix(".md.zst")
+            compressor = zstandard.ZstdCompressor(level=3)
+            with open(compressed_file, "wb") as raw, compressor.stream_writer(raw) as f:
+                f.write(content.encode("utf-8"))
+            return compressed_file
+    
+    output_file.write_text(content)
+    return output_file
+
 async def test_dengue_visualization_agent():
     """Test the DengueDataVisualizationAgent with a sample query."""
     
-    # Create agent configuration
-    agent_config = {
-        "agent_id": "dengue_data_viz_test",
-        "model_config": {
-            "model_type": "instruct",
-            "max_tokens": 512,
-            "temperature": 0.2
-        },
-        # By default, the agent will use the URL from the DENGUE_DATA_URL env var or the default URL
-        # defined in DengueDataTool if neither is provided here
-    }
-    
     # Initialize the agent
-    agent = DengueDataVisualizationAgent(agent_id="dengue_data_viz_test", config=agent_config)
+    agent = _visualization_agent()
     
     # Create a test query for dengue data that another agent might send
     # This includes the date range specified (July 1, 2024 to September 1, 2025)
@@ -76,77 +125,88 @@ async def test_dengue_visualization_agent():
         try:
             result_data = json.loads(response_message.content)
             
-            # Create a markdown report with the results
-            with open(output_file, "w") as f:
-                f.write("# Dengue Data Visualization Test Results\n\n")
-                f.write(f"Test performed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                f.write(f"Query: {test_query}\n\n")
-                f.write(f"Next agent: {next_agent_id}\n\n")
+            # Build the markdown report in memory, then write it in one go
+            parts = []
+            parts.append("# Dengue Data Visualization Test Results\n\n")
+            parts.append(f"Test performed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            parts.append(f"Query: {test_query}\n\n")
+            parts.append(f"Next agent: {next_agent_id}\n\n")
+            
+            # Add metadata
+            parts.append("## Metadata\n\n")
+            parts.append("```json\n")
+            parts.append(json.dumps(response_message.metadata, indent=2))
+            parts.append("\n```\n\n")
+            
+            # Add countries data
+            parts.append("## Countries Data\n\n")
+            for country_data in result_data.get("countries_data", []):
+                country, api_country, historical_data, predicted_data = _unpack_country(
+                    {**COUNTRY_DEFAULTS, **country_data}
+                )
+                historical_data = historical_data or []
+                predicted_data = predicted_data or []
+                historical_count = len(historical_data)
+                predicted_count = len(predicted_data)
+                
+                parts.append(COUNTRY_TEMPLATE.format_map({
+                    "country": country,
+                    "api_country": api_country,
+                    "h_len": historical_count
+                }))
                 
-                # Add metadata
-                f.write("## Metadata\n\n")
-                f.write("```json\n")
-                f.write(json.dumps(response_message.metadata, indent=2))
-                f.write("\n```\n\n")
+                # Sample of historical data
+                if historical_count:
+                    parts.append(SAMPLE_TEMPLATE.format_map({
+                        "kind": "historical",
+                        "sample": json.dumps(historical_data[:3], indent=2)
+                    }))
                 
-                # Add countries data
-                f.write("## Countries Data\n\n")
-                for country_data in result_data.get("countries_data", []):
-                    country = country_data.get("country", "Unknown")
-                    api_country = country_data.get("api_country", "Unknown")
-                    
-                    f.write(f"### {country} (API Source: {api_country})\n\n")
-                    
-                    # Historical data points
-                    historical_data = country_data.get("historical_data", [])
-                    f.write(f"Historical data points: {len(historical_data)}\n\n")
-                    
-                    # Sample of historical data
-                    if historical_data:
-                        f.write("Sample historical data:\n```json\n")
-                        f.write(json.dumps(historical_data[:3], indent=2))
-                        f.write("\n```\n\n")
-                    
-                    # Predicted data points
-                    predicted_data = country_data.get("predicted_data", [])
-                    f.write(f"Predicted data points: {len(predicted_data)}\n\n")
-                    
-                    # Sample of predicted data
-                    if predicted_data:
-                        f.write("Sample predicted data:\n```json\n")
-                        f.write(json.dumps(predicted_data[:3], indent=2))
-                        f.write("\n```\n\n")
+                # Predicted data points
+                parts.append(PREDICTED_COUNT_TEMPLATE.format_map({"p_len": predicted_count}))
+                
+                # Sample of predicted data
+                if predicted_count:
+                    parts.append(SAMPLE_TEMPLATE.format_map({
+                        "kind": "predicted",
+                        "sample": json.dumps(predicted_data[:3], indent=2)
+                    }))
+            
+            # Add analysis
+            if "analysis" in result_data:
+                parts.append("## Analysis\n\n")
                 
-                # Add analysis
-                if "analysis" in result_data:
-                    f.write("## Analysis\n\n")
-                    
-                    # Insights
-                    f.write("### Insights\n\n")
-                    for insight in result_data["analysis"].get("insights", []):
-                        f.write(f"- {insight}\n")
-                    
-                    # Trends
-                    f.write("\n### Trends\n\n")
-                    for trend in result_data["analysis"].get("trends", []):
-                        f.write(f"- {trend}\n")
-                    
-                    # Recommendations
-                    f.write("\n### Recommendations\n\n")
-                    for recommendation in result_data["analysis"].get("recommendations", []):
-                        f.write(f"- {recommendation}\n")
-                    
-                    # Summaries (for human-readable results)
-                    f.write("\n### Data Summaries\n\n")
-                    for summary in result_data["analysis"].get("summaries", []):
-                        f.write(f"#### {summary.get('country', 'Unknown')}\n\n")
-                        f.write(f"{summary.get('summary', 'No summary available')}\n\n")
+                # Insights
+                parts.append("### Insights\n\n")
+                for insight in result_data["analysis"].get("insights", []):
+                    parts.append(BULLET_TEMPLATE.format_map({"item": insight}))
                 
-                # Add raw JSON response for reference
-                f.write("## Raw JSON Response\n\n")
-                f.write("```json\n")
-                f.write(json.dumps(result_data, indent=2))
-                f.write("\n```\n")
+                # Trends
+                parts.append("\n### Trends\n\n")
+                for trend in result_data["analysis"].get("trends", []):
+                    parts.append(BULLET_TEMPLATE.format_map({"item": trend}))
+                
+                # Recommendations
+                parts.append("\n### Recommendations\n\n")
+                for recommendation in result_data["analysis"].get("recommendations", []):
+                    parts.append(BULLET_TEMPLATE.format_map({"item": recommendation}))
+                
+                # Summaries (for human-readable results)
+                parts.append("\n### Data Summaries\n\n")
+                for summary in result_data["analysis"].get("summaries", []):
+                    parts.append(SUMMARY_TEMPLATE.format_map({
+                        "country": summary.get("country", "Unknown"),
+                        "summary": summary.get("summary", "No summary available")
+                    }))
+            
+            # Add raw JSON response for reference
+            parts.append("## Raw JSON Response\n\n")
+            parts.append("```json\n")
+            parts.append(json.dumps(result_data, indent=2))
+            parts.append("\n```\n")
+            
+            # Offload the disk write so the event loop stays responsive
+            output_file = await asyncio.to_thread(_write_report, output_file, "".join(parts))
             
             logger.info(f"Test results written to {output_file}")
             return str(output_file)
@@ -155,13 +215,15 @@ async def test_dengue_visualization_agent():
             logger.error("Failed to parse agent response as JSON")
             
             # Save the raw response
-            with open(output_file, "w") as f:
-                f.write("# Dengue Data Visualization Test Results (Error)\n\n")
-                f.write(f"Test performed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                f.write(f"Query: {test_query}\n\n")
-                f.write("Error: Failed to parse agent response as JSON\n\n")
-                f.write("## Raw Response\n\n")
-                f.write(response_message.content)
+            parts = [
+                "# Dengue Data Visualization Test Results (Error)\n\n",
+                f"Test performed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+                f"Query: {test_query}\n\n",
+                "Error: Failed to parse agent response as JSON\n\n",
+                "## Raw Response\n\n",
+                response_message.content,
+            ]
+            output_file = await asyncio.to_thread(_write_report, output_file, "".join(parts))
             
             logger.info(f"Error report written to {output_file}")
             return str(output_file)
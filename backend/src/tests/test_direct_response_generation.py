@@ -9,6 +9,7 @@ import logging
 import os
 import time
 from datetime import datetime
+from functools import lru_cache
 
 from src.agent_system.core.message import Message, MessageRole
 from src.agent_system.rag_system.synthesis.response_generator_agent import ResponseGeneratorAgent
@@ -79,20 +80,25 @@ SAMPLE_SYMPTOM_DATA = {
     ]
 }
 
+# Response generator agent configuration
+AGENT_CONFIG = {
+    "agent_id": "response_generator_agent",
+    "model_config": {
+        "model_type": "instruct",
+        "max_tokens": 2048,
+        "temperature": 0.5
+    },
+    "prompt_id": "rag.response_generator"
+}
+
+@lru_cache(maxsize=1)
+def _response_agent():
+    """Build the response generator agent once and reuse it across runs."""
+    return ResponseGeneratorAgent("response_generator_agent", AGENT_CONFIG)
+
 async def test_direct_response_generation():
     """Test the response generator with direct sample data."""
-    # Initialize response generator agent
-    agent_config = {
-        "agent_id": "response_generator_agent",
-        "model_config": {
-            "model_type": "instruct",
-            "max_tokens": 2048,
-            "temperature": 0.5
-        },
-        "prompt_id": "rag.response_generator"
-    }
-    
-    response_agent = ResponseGeneratorAgent("response_generator_agent", agent_config)
+    response_agent = _response_agent()
     
     # Create timestamp for output
     timestamp = int(time.time())
@@ -8,15 +8,22 @@ due to connectivity issues with external services.
 Usage:
     python test_endpoints.py
 """
+from __future__ import annotations
+
 import os
 import sys
-import json
 import time
-import httpx
 import asyncio
 import logging
 from dotenv import load_dotenv
-from typing import Dict, List, Tuple, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Any
+
+# httpx is only needed once the probes run, so it's imported lazily in run_all_tests
+if TYPE_CHECKING:
+    import httpx
+
+from _compat import run_async, loads_json, dumps_json
+from _secrets import mask_api_key
 
 # Set up logging
 logging.basicConfig(
@@ -39,6 +46,10 @@ except ImportError:
     YELLOW = ""
     RESET = ""
 
+# Status labels used in the results table
+PASS_STATUS = f"{GREEN}✅ PASS{RESET}".ljust(10)
+FAIL_STATUS = f"{RED}❌ FAIL{RESET}".ljust(10)
+
 # Load environment variables
 load_dotenv()
 
@@ -49,6 +60,9 @@ API_KEYS = {
     "granite_embedding": os.getenv("GRANITE_EMBEDDING_API_KEY"),
 }
 
+# Masked keys for logging, computed once since the keys don't change
+MASKED_API_KEYS = {name: mask_api_key(key) for name, key in API_KEYS.items() if key}
+
 API_URLS = {
     "granite_instruct": os.getenv("GRANITE_INSTRUCT_URL"),
     "granite_guardian": os.getenv("GRANITE_GUARDIAN_URL"),
@@ -56,6 +70,18 @@ API_URLS = {
     "knowledge_graph": os.getenv("KG_API_URL"),
 }
 
+def normalize_base_url(url: str) -> str:
+    """Strip a trailing chat completions path or slash from an endpoint URL."""
+    if url.endswith('/v1/chat/completions'):
+        return url[:-len('/v1/chat/completions')]
+    elif url.endswith('/'):
+        return url[:-1]
+    return url
+
+# Normalized base URLs and chat completions URLs, computed once at import
+BASE_URLS = {name: normalize_base_url(url) for name, url in API_URLS.items() if url}
+CHAT_URLS = {name: f"{base_url}/v1/chat/completions" for name, base_url in BASE_URLS.items()}
+
 # Test messages for each endpoint
 TEST_MESSAGES = {
     "granite_instruct": [
@@ -74,10 +100,28 @@ MODEL_IDS = {
     "granite_guardian": os.getenv("GRANITE_GUARDIAN_MODEL_NAME", "granite3-guardian-2b"),
 }
 
+# Pre-serialized request bodies, since model and messages are fixed per endpoint
+REQUEST_BODIES = {
+    name: dumps_json({
+        "model": MODEL_IDS.get(name),
+        "messages": messages,
+        "max_tokens": 50
+    })
+    for name, messages in TEST_MESSAGES.items()
+}
+
 # Knowledge Graph API test endpoint
 KG_API_TEST_ENDPOINT = "/health"
 
+# Connection pool limits for the shared HTTP client
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_MAX_CONNECTIONS = 100
+
+# Upper bound on a whole check (connect + TLS + response), in seconds
+PROBE_TIMEOUT = 20.0
+
 async def test_llm_endpoint(
+    client: httpx.AsyncClient,
     name: str, 
     url: str, 
     api_key: str, 
@@ -87,6 +131,7 @@ async def test_llm_endpoint(
     Test an LLM API endpoint to ensure it's responsive.
     
     Args:
+        client: Shared HTTP client
         name: Name of the endpoint
         url: API URL
         api_key: API key
@@ -96,14 +141,9 @@ async def test_llm_endpoint(
         Tuple of (success, details)
     """
     try:
-        # Ensure URL doesn't end with /v1/chat/completions already
-        if url.endswith('/v1/chat/completions'):
-            base_url = url[:-len('/v1/chat/completions')]
-        elif url.endswith('/'):
-            base_url = url[:-1]
-        else:
-            base_url = url
-            
+        # Use the precomputed URL for known endpoints
+        chat_url = CHAT_URLS.get(name) or f"{normalize_base_url(url)}/v1/chat/completions"
+        
         # Prepare the request
         headers = {
             "Content-Type": "application/json",
@@ -113,32 +153,36 @@ async def test_llm_endpoint(
         # Get model ID
         model_id = MODEL_IDS.get(name)
         
-        data = {
-            "model": model_id,
-            "messages": messages,
-            "max_tokens": 50
-        }
+        # Reuse the pre-serialized body unless custom messages were passed
+        if messages is TEST_MESSAGES.get(name):
+            body = REQUEST_BODIES[name]
+        else:
+            body = dumps_json({
+                "model": model_id,
+                "messages": messages,
+                "max_tokens": 50
+            })
         
         # Log request details (masked for security)
-        masked_key = api_key[:4] + "*" * (len(api_key) - 8) + api_key[-4:]
-        logger.info(f"Testing {name} endpoint at {base_url}/v1/chat/completions")
+        masked_key = MASKED_API_KEYS.get(name, "****")
+        logger.info(f"Testing {name} endpoint at {chat_url}")
         logger.info(f"Using API key: {masked_key}")
         logger.info(f"Using model: {model_id}")
         
         # Make the request with timeout
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                f"{base_url}/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
+        response = await client.post(
+            chat_url,
+            headers=headers,
+            content=body,
+            timeout=15.0
+        )
             
         # Log response details
         logger.info(f"Response status: {response.status_code}")
             
         # Check response
         if response.status_code == 200:
-            result = response.json()
+            result = loads_json(await response.aread())
             content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
             return True, f"Success: {content[:30]}..."
         else:
@@ -147,11 +191,12 @@ async def test_llm_endpoint(
     except Exception as e:
         return False, f"Error: {str(e)}"
 
-async def test_kg_api_endpoint(url: str) -> Tuple[bool, str]:
+async def test_kg_api_endpoint(client: httpx.AsyncClient, url: str) -> Tuple[bool, str]:
     """
     Test the Knowledge Graph API endpoint.
     
     Args:
+        client: Shared HTTP client
         url: API URL
         
     Returns:
@@ -165,8 +210,7 @@ async def test_kg_api_endpoint(url: str) -> Tuple[bool, str]:
         # Make the request with timeout
         logger.info(f"Testing KG API endpoint at {url}{KG_API_TEST_ENDPOINT}")
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{url}{KG_API_TEST_ENDPOINT}")
+        response = await client.get(f"{url}{KG_API_TEST_ENDPOINT}", timeout=10.0)
             
         # Check response
         if response.status_code == 200:
@@ -184,31 +228,54 @@ async def run_all_tests() -> Dict[str, Tuple[bool, str]]:
     Returns:
         Dictionary of test results
     """
-    results = {}
-    
-    # Test LLM endpoints
-    for name in ["granite_instruct", "granite_guardian"]:
-        if API_KEYS.get(name) and API_URLS.get(name):
-            logger.info(f"Testing {name} endpoint...")
-            success, details = await test_llm_endpoint(
-                name, 
-                API_URLS[name], 
-                API_KEYS[name],
-                TEST_MESSAGES[name]
-            )
-            results[name] = (success, details)
+    import httpx
+    
+    # Share one pooled client across all probes so connections are reused
+    limits = httpx.Limits(
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections=HTTP_MAX_CONNECTIONS
+    )
+    async with httpx.AsyncClient(timeout=15.0, limits=limits) as client:
+        results = {}
+        tasks = []
+    
+        # Queue LLM endpoint checks
+        for name in ["granite_instruct", "granite_guardian"]:
+            if API_KEYS.get(name) and API_URLS.get(name):
+                logger.info(f"Testing {name} endpoint...")
+                tasks.append((name, test_llm_endpoint(
+                    client,
+                    name, 
+                    API_URLS[name], 
+                    API_KEYS[name],
+                    TEST_MESSAGES[name]
+                )))
+            else:
+                results[name] = (False, "API key or URL not configured")
+    
+        # Queue Knowledge Graph API check
+        if API_URLS.get("knowledge_graph"):
+            logger.info("Testing Knowledge Graph API...")
+            tasks.append(("knowledge_graph", test_kg_api_endpoint(client, API_URLS["knowledge_graph"])))
         else:
-            results[name] = (False, "API key or URL not configured")
+            results["knowledge_graph"] = (False, "API URL not configured")
     
-    # Test Knowledge Graph API
-    if API_URLS.get("knowledge_graph"):
-        logger.info("Testing Knowledge Graph API...")
-        success, details = await test_kg_api_endpoint(API_URLS["knowledge_graph"])
-        results["knowledge_graph"] = (success, details)
-    else:
-        results["knowledge_graph"] = (False, "API URL not configured")
+        # The checks are independent, so run them concurrently, each with a hard deadline
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(coro, timeout=PROBE_TIMEOUT) for _, coro in tasks),
+            return_exceptions=True
+        )
+        for (name, _), outcome in zip(tasks, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                results[name] = (False, f"Timeout after {PROBE_TIMEOUT:.0f}s")
+            elif isinstance(outcome, Exception):
+                results[name] = (False, f"Error: {str(outcome)}")
+            else:
+                results[name] = outcome
     
-    return results
+    # Report in a stable order regardless of which check finished first
+    order = ["granite_instruct", "granite_guardian", "knowledge_graph"]
+    return {name: results[name] for name in order}
 
 def print_results(results: Dict[str, Tuple[bool, str]]) -> bool:
     """
@@ -220,24 +287,28 @@ def print_results(results: Dict[str, Tuple[bool, str]]) -> bool:
     Returns:
         True if all tests passed, False otherwise
     """
-    print("\n" + "=" * 60)
-    print(" ENDPOINT TEST RESULTS ".center(60, "="))
-    print("=" * 60)
+    lines = [
+        "\n" + "=" * 60,
+        " ENDPOINT TEST RESULTS ".center(60, "="),
+        "=" * 60
+    ]
     
     all_success = True
     
     for name, (success, details) in results.items():
-        status = f"{GREEN}✅ PASS{RESET}" if success else f"{RED}❌ FAIL{RESET}"
-        print(f"{name.upper().ljust(20)} {status.ljust(10)} {details}")
+        lines.append(f"{name.upper():<20} {PASS_STATUS if success else FAIL_STATUS} {details}")
         if not success:
             all_success = False
     
-    print("=" * 60)
+    lines.append("=" * 60)
     if all_success:
-        print(f"{GREEN}🎉 All endpoint tests passed! The system is ready for workflow tests.{RESET}")
+        lines.append(f"{GREEN}🎉 All endpoint tests passed! The system is ready for workflow tests.{RESET}")
     else:
-        print(f"{RED}⚠️  Some endpoint tests failed. Fix connectivity issues before running workflow tests.{RESET}")
-    print("=" * 60 + "\n")
+        lines.append(f"{RED}⚠️  Some endpoint tests failed. Fix connectivity issues before running workflow tests.{RESET}")
+    lines.append("=" * 60 + "\n")
+    
+    # Emit the whole table in a single write
+    print("\n".join(lines))
     
     return all_success
 
@@ -251,4 +322,4 @@ async def main() -> None:
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -6,11 +6,13 @@ validation errors using conversational feedback.
 """
 import os
 import sys
-import json
 import logging
 import asyncio
 from pathlib import Path
 
+from _compat import run_async
+from _report import ATTEMPTS_RESULT_TEMPLATE, format_result
+
 # Add the project root to the Python path
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
@@ -44,32 +46,38 @@ TEST_QUERIES = [
     "Explain the connection between INVALID_NODE_LABEL and NONEXISTENT_RELATIONSHIP_TYPE in dengue fever research",
 ]
 
-async def test_hybrid_query_writer_with_feedback(query: str):
+# Maximum number of queries in flight against the LLM at once
+MAX_CONCURRENT_QUERIES = 5
+
+# Configuration for the HybridQueryWriterAgent under test
+AGENT_CONFIG = {
+    "agent_id": "test_hybrid_query_writer_agent",
+    "class_name": "HybridQueryWriterAgent",
+    "model_config": {
+        "model_type": "instruct",
+        "temperature": 0.1,
+        "max_tokens": 1024
+    },
+    "max_icl_attempts": 2  # Set to 2 for faster testing
+}
+
+def create_agent() -> HybridQueryWriterAgent:
+    """Create the HybridQueryWriterAgent shared by all test queries."""
+    return HybridQueryWriterAgent(
+        agent_id="test_hybrid_query_writer_agent", 
+        config=AGENT_CONFIG
+    )
+
+async def test_hybrid_query_writer_with_feedback(agent: HybridQueryWriterAgent, query: str):
     """
     Test the HybridQueryWriterAgent with a specific query, focusing on feedback.
     
     Args:
+        agent: The HybridQueryWriterAgent to run the query through
         query: The query to test
     """
     logger.info(f"Testing query with feedback: {query}")
     
-    # Initialize the HybridQueryWriterAgent
-    agent_config = {
-        "agent_id": "test_hybrid_query_writer_agent",
-        "class_name": "HybridQueryWriterAgent",
-        "model_config": {
-            "model_type": "instruct",
-            "temperature": 0.1,
-            "max_tokens": 1024
-        },
-        "max_icl_attempts": 2  # Set to 2 for faster testing
-    }
-    
-    agent = HybridQueryWriterAgent(
-        agent_id="test_hybrid_query_writer_agent", 
-        config=agent_config
-    )
-    
     # Create a message from the query
     message = Message(
         role=MessageRole.USER,
@@ -79,13 +87,6 @@ async def test_hybrid_query_writer_with_feedback(query: str):
     # Process the message
     response_message, next_agent = await agent.process(message)
     
-    # Extract the query information
-    query_data = {}
-    try:
-        query_data = json.loads(response_message.content)
-    except json.JSONDecodeError:
-        logger.warning(f"Could not parse response content as JSON: {response_message.content}")
-    
     # Get key information from response
     generated_query = response_message.metadata.get("query", "No query generated")
     approach = response_message.metadata.get("approach", "unknown")
@@ -103,42 +104,50 @@ async def test_hybrid_query_writer_with_feedback(query: str):
         "attempts": attempts
     }
 
+def append_to_file(path: str, text: str) -> None:
+    """Append text to a file so each result is persisted as soon as it's ready."""
+    with open(path, "a") as f:
+        f.write(text)
+
 async def run_tests():
     """Run tests for all queries and save results."""
-    results = []
-    
-    for query in TEST_QUERIES:
-        try:
-            result = await test_hybrid_query_writer_with_feedback(query)
-            results.append(result)
-            logger.info(f"Test for '{query}' completed successfully")
-            logger.info("-" * 80)
-        except Exception as e:
-            logger.error(f"Error testing query '{query}': {str(e)}")
-            results.append({
-                "query": query,
-                "error": str(e)
-            })
-    
-    # Save results to a file
+    # Build the agent once and reuse it for every query
+    agent = create_agent()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+    
+    # Start a fresh report; results are appended as each query finishes so partial
+    # progress survives a crash, then rewritten in TEST_QUERIES order at the end
     output_file = os.path.join(project_root, "feedback_query_results.md")
+    header = "# Feedback-Based Query Generation Test Results\n\n"
     with open(output_file, "w") as f:
-        f.write("# Feedback-Based Query Generation Test Results\n\n")
+        f.write(header)
+    write_lock = asyncio.Lock()
+    
+    async def run_one(index: int, query: str):
+        async with semaphore:
+            try:
+                result = await test_hybrid_query_writer_with_feedback(agent, query)
+                logger.info(f"Test for '{query}' completed successfully")
+                logger.info("-" * 80)
+            except Exception as e:
+                logger.error(f"Error testing query '{query}': {str(e)}")
+                result = {
+                    "query": query,
+                    "error": str(e)
+                }
         
-        for i, result in enumerate(results):
-            f.write(f"## Query {i+1}: {result['query']}\n\n")
-            
-            if "error" in result:
-                f.write(f"**Error:** {result['error']}\n\n")
-            else:
-                f.write(f"**Approach Used:** {result.get('approach', 'unknown')}\n\n")
-                f.write(f"**Attempts Required:** {result.get('attempts', 0)}\n\n")
-                f.write("**Generated Cypher Query:**\n\n")
-                f.write("```cypher\n")
-                f.write(result.get('generated_query', 'No query generated'))
-                f.write("\n```\n\n")
-            
-            f.write("---\n\n")
+        # Persist immediately (in completion order) so partial progress survives a crash or interrupt
+        async with write_lock:
+            await asyncio.to_thread(append_to_file, output_file, format_result(index, result, ATTEMPTS_RESULT_TEMPLATE))
+        return result
+    
+    # Queries are independent, so run them concurrently; gather keeps submission order
+    results = await asyncio.gather(*(run_one(i, query) for i, query in enumerate(TEST_QUERIES)))
+    
+    # Rewrite the report in query order now that every result is in
+    parts = [header]
+    parts.extend(format_result(i, result, ATTEMPTS_RESULT_TEMPLATE) for i, result in enumerate(results))
+    await asyncio.to_thread(Path(output_file).write_text, "".join(parts))
     
     logger.info(f"Results saved to {output_file}")
     
@@ -149,7 +158,7 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         # Run test with a single query
         query = " ".join(sys.argv[1:])
-        asyncio.run(test_hybrid_query_writer_with_feedback(query))
+        run_async(test_hybrid_query_writer_with_feedback(create_agent(), query))
     else:
         # Run all tests
-        asyncio.run(run_tests())
+        run_async(run_tests())
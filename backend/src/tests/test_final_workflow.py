@@ -3,11 +3,13 @@ Final test of the Graph RAG workflow with the citation fixes.
 Tests the symptoms query which should now include proper citations.
 """
 import asyncio
-import json
 import logging
-import os
+import re
 import time
 from datetime import datetime
+from pathlib import Path
+
+from _compat import run_async, dumps_pretty
 
 from src.agent_system.core.workflow_manager import WorkflowManager
 from src.registries.agent_registry import AgentRegistry
@@ -17,22 +19,28 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Output directory
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "final_test_results")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+OUTPUT_DIR = BACKEND_ROOT / "final_test_results"
+OUTPUT_DIR.mkdir(exist_ok=True)
+
+# Workflow registry directory
+WORKFLOW_DIR = BACKEND_ROOT / "src" / "registries" / "workflows"
+
+# Markers that indicate the response text contains citations
+CITATION_PATTERN = re.compile(r"References|Citations|\[1\]")
 
 async def test_workflow_with_citations():
     """Test the workflow with a symptoms query and verify citations are included."""
     # Initialize workflow manager
-    workflow_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "registries", "workflows")
     agent_registry = AgentRegistry()
-    workflow_manager = WorkflowManager(workflow_dir, agent_registry)
+    workflow_manager = WorkflowManager(str(WORKFLOW_DIR), agent_registry)
     
     # Test query about symptoms
     query = "What are the main symptoms of dengue fever?"
     
     # Timestamp for output file
     timestamp = int(time.time())
-    output_file = os.path.join(OUTPUT_DIR, f"final_workflow_test_{timestamp}.md")
+    output_file = str(OUTPUT_DIR / f"final_workflow_test_{timestamp}.md")
     
     # Define callbacks for detailed output
     thinking_logs = []
@@ -51,48 +59,50 @@ async def test_workflow_with_citations():
         workflow_id="GRAPH_RAG_WORKFLOW"
     )
     
-    # Create markdown report
-    with open(output_file, "w") as f:
-        f.write("# Final Workflow Test with Citations\n\n")
-        f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write(f"## Query\n\n{query}\n\n")
-        
-        # Add response
-        if isinstance(result, dict) and "response" in result:
-            response_text = result["response"]
-            f.write(f"## Response\n\n```markdown\n{response_text}\n```\n\n")
+    # Create markdown report off the event loop so large logs don't block it
+    def write_report():
+        with open(output_file, "w") as f:
+            f.write("# Final Workflow Test with Citations\n\n")
+            f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            f.write(f"## Query\n\n{query}\n\n")
             
-            # Check for citations in the metadata
-            has_citations = False
-            citation_count = 0
-            if "metadata" in result and isinstance(result["metadata"], dict):
-                has_citations = result["metadata"].get("has_citations", False)
-                citation_count = result["metadata"].get("citation_count", 0)
+            # Add response
+            if isinstance(result, dict) and "response" in result:
+                response_text = result["response"]
+                f.write(f"## Response\n\n```markdown\n{response_text}\n```\n\n")
+                
+                # Check for citations in the metadata
+                has_citations = False
+                citation_count = 0
+                if "metadata" in result and isinstance(result["metadata"], dict):
+                    has_citations = result["metadata"].get("has_citations", False)
+                    citation_count = result["metadata"].get("citation_count", 0)
+                
+                # Also check content for citations
+                content_has_citations = bool(CITATION_PATTERN.search(response_text))
+                
+                f.write(f"## Has Citations: {has_citations or content_has_citations}\n\n")
+                if citation_count > 0:
+                    f.write(f"## Citation Count: {citation_count}\n\n")
+                
+                # Add metadata
+                if "metadata" in result:
+                    f.write("## Response Metadata\n\n")
+                    f.write("```json\n")
+                    f.write(dumps_pretty(result["metadata"]))
+                    f.write("\n```\n\n")
+            else:
+                f.write(f"## Raw Response\n\n```\n{result}\n```\n\n")
             
-            # Also check content for citations
-            content_has_citations = "References" in response_text or "Citations" in response_text or "[1]" in response_text
-            
-            f.write(f"## Has Citations: {has_citations or content_has_citations}\n\n")
-            if citation_count > 0:
-                f.write(f"## Citation Count: {citation_count}\n\n")
-            
-            # Add metadata
-            if "metadata" in result:
-                f.write("## Response Metadata\n\n")
-                f.write("```json\n")
-                f.write(json.dumps(result["metadata"], indent=2))
-                f.write("\n```\n\n")
-        else:
-            f.write(f"## Raw Response\n\n```\n{result}\n```\n\n")
-        
-        # Add thinking logs
-        f.write("## Agent Processing Details\n\n")
-        for log in thinking_logs:
-            f.write(log)
+            # Add thinking logs
+            f.write("## Agent Processing Details\n\n")
+            f.write("".join(thinking_logs))
+    
+    await asyncio.to_thread(write_report)
     
     logger.info(f"Final workflow test completed. Results saved to {output_file}")
     return output_file
 
 if __name__ == "__main__":
     """Run the test when script is executed directly."""
-    asyncio.run(test_workflow_with_citations())
+    run_async(test_workflow_with_citations())
@@ -4,13 +4,18 @@ Test script for the conversational feedback approach with forced validation erro
 This script tests the HybridQueryWriterAgent with a modified validation method
 that forces validation failures on the first attempt to demonstrate feedback.
 """
+import io
 import os
 import sys
+import re
 import json
 import logging
-import asyncio
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, Tuple, Set, Optional
+from typing import Deque, Dict, Any, Tuple, Set, Optional
+
+from _compat import run_async, loads_json, dumps_pretty
 
 # Add the project root to the Python path
 project_root = Path(__file__).parents[2]
@@ -30,13 +35,51 @@ logger = logging.getLogger("forced_feedback_test")
 # Test query that should trigger the feedback loop
 TEST_QUERY = "Explain the connection between climate and dengue fever"
 
+# Feedback sent back to the ICL agent after a validation failure
+FEEDBACK_TEMPLATE = (
+    "The Cypher query you provided has an error: {error}\n\n"
+    "Invalid query:\n```cypher\n{query}\n```\n\n"
+    "Please correct the query. Remember:\n"
+    "1. Use only valid node labels like: {nodes}\n"
+    "2. Use only valid relationship types like: {rels}\n"
+    "3. Pay attention to relationship directions\n"
+    "4. Include Citation nodes with HAS_SOURCE relationships\n\n"
+    "Generate a new, corrected query."
+)
+
+# Bound once to avoid repeated enum attribute lookups in the report loop
+USER_ROLE = MessageRole.USER
+
+# Escaped quotes and newlines left in generated Cypher queries
+ESCAPE_PATTERN = re.compile(r'\\(["n])')
+ESCAPE_REPLACEMENTS = {'"': '"', 'n': '\n'}
+
+def unescape_query(query: str) -> str:
+    """Replace escaped quotes and newlines in a query in a single pass."""
+    return ESCAPE_PATTERN.sub(lambda match: ESCAPE_REPLACEMENTS[match.group(1)], query)
+
+def format_json_content(content: str) -> Optional[str]:
+    """
+    Pretty-print JSON message content, or return None if it isn't JSON.
+    
+    Content that already looks like indented JSON is returned as-is to avoid
+    a parse and re-serialize round trip.
+    """
+    stripped = content.strip()
+    if stripped.startswith("{") and stripped.endswith("}") and '\n  "' in stripped[:200]:
+        return stripped
+    try:
+        return dumps_pretty(loads_json(content))
+    except Exception:
+        return None
+
 class ForcedFeedbackHybridAgent(HybridQueryWriterAgent):
     """Subclass that forces validation failures on first attempt"""
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.validation_attempt = 0
-        self._last_conversation = []  # Store the conversation history here
+        self._last_conversation: Deque[Message] = deque()  # Store the conversation history here
     
     def _validate_query(
         self, query: str, valid_node_labels: Set[str], valid_rel_types: Set[str]
@@ -70,8 +113,9 @@ class ForcedFeedbackHybridAgent(HybridQueryWriterAgent):
         """
         Override to capture conversation history
         """
-        # Store initial user message
-        self._last_conversation = [message]
+        # Store initial user message; the history is also the conversation sent to the
+        # ICL agent, so it must keep every message, starting with the original query
+        self._last_conversation = deque([message])
         
         # Get schema for validation
         schema = await self._retrieve_schema()
@@ -83,8 +127,9 @@ class ForcedFeedbackHybridAgent(HybridQueryWriterAgent):
         logger.info(f"Valid node labels: {valid_node_labels}")
         logger.info(f"Valid relationship types: {valid_rel_types}")
         
-        # Initialize conversation with the user's original message
-        conversation = [message]
+        # Schema samples for feedback messages don't change between attempts
+        node_sample = ", ".join(islice(valid_node_labels, 5)) + "..."
+        rel_sample = ", ".join(islice(valid_rel_types, 5)) + "..."
         
         # Try ICL approach first with limited attempts in a conversational manner
         icl_attempts = 0
@@ -98,16 +143,13 @@ class ForcedFeedbackHybridAgent(HybridQueryWriterAgent):
             
             # Process with ICL agent using conversation
             response, cypher_query, is_valid, attempt_count = await self.icl_agent.process_with_feedback(
-                conversation, valid_node_labels, valid_rel_types, session_id
+                list(self._last_conversation), valid_node_labels, valid_rel_types, session_id
             )
             
             # Update the actual attempt count (important for tracking)
             icl_attempts = attempt_count
             
             # Update conversation with the agent's response
-            conversation.append(response)
-            
-            # Store the response in our conversation history
             self._last_conversation.append(response)
             
             # Validate the query
@@ -131,18 +173,11 @@ class ForcedFeedbackHybridAgent(HybridQueryWriterAgent):
                 # If we have attempts left, add feedback to the conversation
                 if icl_attempts < self.max_icl_attempts:
                     # Create a message with feedback about the validation error
-                    rel_sample = ", ".join(list(valid_rel_types)[:5]) + "..."
-                    node_sample = ", ".join(list(valid_node_labels)[:5]) + "..."
-                    
-                    feedback_content = (
-                        f"The Cypher query you provided has an error: {validation_error}\n\n"
-                        f"Invalid query:\n```cypher\n{cypher_query}\n```\n\n"
-                        f"Please correct the query. Remember:\n"
-                        f"1. Use only valid node labels like: {node_sample}\n"
-                        f"2. Use only valid relationship types like: {rel_sample}\n"
-                        f"3. Pay attention to relationship directions\n"
-                        f"4. Include Citation nodes with HAS_SOURCE relationships\n\n"
-                        f"Generate a new, corrected query."
+                    feedback_content = FEEDBACK_TEMPLATE.format(
+                        error=validation_error,
+                        query=cypher_query,
+                        nodes=node_sample,
+                        rels=rel_sample
                     )
                     
                     feedback_message = Message(
@@ -150,8 +185,7 @@ class ForcedFeedbackHybridAgent(HybridQueryWriterAgent):
                         content=feedback_content
                     )
                     
-                    # Add feedback to conversations
-                    conversation.append(feedback_message)
+                    # Add feedback to the conversation
                     self._last_conversation.append(feedback_message)
         
         # If ICL approach failed after max attempts, try two-step
@@ -251,14 +285,15 @@ async def test_forced_feedback():
     # Extract the query information
     query_data = {}
     try:
-        query_data = json.loads(response_message.content)
+        query_data = loads_json(response_message.content)
     except json.JSONDecodeError:
         logger.warning(f"Could not parse response content as JSON: {response_message.content}")
     
     # Get key information from response
-    generated_query = response_message.metadata.get("query", "No query generated")
-    approach = response_message.metadata.get("approach", "unknown")
-    attempts = response_message.metadata.get("attempts", 0)
+    response_metadata = response_message.metadata
+    generated_query = response_metadata.get("query", "No query generated")
+    approach = response_metadata.get("approach", "unknown")
+    attempts = response_metadata.get("attempts", 0)
     
     logger.info(f"Generated query using {approach} approach after {attempts} attempts:")
     logger.info(f"{generated_query}")
@@ -273,74 +308,81 @@ async def test_forced_feedback():
     
     # Save results to a file
     output_file = os.path.join(project_root, "forced_feedback_results.md")
-    with open(output_file, "w") as f:
-        f.write("# Forced Feedback-Based Query Generation Test Results\n\n")
-        
-        f.write(f"## Query: {result['query']}\n\n")
-        f.write(f"**Approach Used:** {result['approach']}\n\n")
-        f.write(f"**Attempts Required:** {result['attempts']}\n\n")
-        f.write("**Generated Cypher Query:**\n\n")
-        f.write("```cypher\n")
-        
-        # Clean up the query by replacing escaped quotes and newlines
-        clean_query = result.get('generated_query', 'No query generated')
-        clean_query = clean_query.replace('\\"', '"').replace('\\n', '\n')
-        
-        # If RETURN clause is incomplete, try to extract a more complete query from metadata
-        if clean_query.strip().endswith('RETURN'):
-            # Check if we can get more complete query from agent's last response
-            if agent._last_conversation and len(agent._last_conversation) >= 2:
-                last_response = agent._last_conversation[-1]
-                if "query" in last_response.metadata:
-                    complete_query = last_response.metadata["query"]
-                    complete_query = complete_query.replace('\\"', '"').replace('\\n', '\n')
-                    clean_query = complete_query
-        
-        f.write(clean_query)
-        f.write("\n```\n\n")
-        
-        # Add the full conversation exchange
-        f.write("## Conversation Exchange\n\n")
-        
-        # Get the messages from the agent's conversation
-        conversation = getattr(agent, '_last_conversation', [])
-        if not conversation:
-            f.write("*No conversation recorded*\n\n")
-        else:
-            for i, msg in enumerate(conversation):
-                if msg.role == MessageRole.USER:
-                    if i == 0:
-                        f.write("### 👤 User Query\n\n")
-                    else:
-                        f.write(f"### 👤 System Feedback (Attempt {i//2})\n\n")
-                    f.write(f"{msg.content}\n\n")
-                else:  # ASSISTANT
-                    f.write(f"### 🤖 Assistant Response (Attempt {i//2 + 1})\n\n")
-                    
-                    # Try to extract and format JSON content
-                    try:
-                        content_json = json.loads(msg.content)
-                        f.write("**Response JSON:**\n\n")
-                        f.write("```json\n")
-                        f.write(json.dumps(content_json, indent=2))
-                        f.write("\n```\n\n")
-                    except:
-                        f.write(f"{msg.content}\n\n")
-                    
-                    # Show the query if available in metadata
-                    if "query" in msg.metadata:
-                        f.write("**Generated Query:**\n\n")
-                        f.write("```cypher\n")
-                        # Clean up the query by replacing escaped quotes and newlines
-                        query = msg.metadata["query"].replace('\\"', '"').replace('\\n', '\n')
-                        f.write(query)
-                        f.write("\n```\n\n")
-                    
-                    f.write("---\n\n")
-        
+    
+    # Build the report in memory and write it with a single call
+    buf = io.StringIO()
+    buf.write("# Forced Feedback-Based Query Generation Test Results\n\n")
+    
+    buf.write(f"## Query: {result['query']}\n\n")
+    buf.write(f"**Approach Used:** {result['approach']}\n\n")
+    buf.write(f"**Attempts Required:** {result['attempts']}\n\n")
+    buf.write("**Generated Cypher Query:**\n\n")
+    buf.write("```cypher\n")
+    
+    # Clean up the query by replacing escaped quotes and newlines
+    clean_query = result.get('generated_query', 'No query generated')
+    clean_query = unescape_query(clean_query)
+    
+    # If RETURN clause is incomplete, try to extract a more complete query from metadata
+    if clean_query.strip().endswith('RETURN'):
+        # Check if we can get more complete query from agent's last response
+        if agent._last_conversation and len(agent._last_conversation) >= 2:
+            last_response = agent._last_conversation[-1]
+            if "query" in last_response.metadata:
+                complete_query = last_response.metadata["query"]
+                clean_query = unescape_query(complete_query)
+    
+    buf.write(clean_query)
+    buf.write("\n```\n\n")
+    
+    # Add the full conversation exchange
+    buf.write("## Conversation Exchange\n\n")
+    
+    # Get the messages from the agent's conversation
+    conversation = getattr(agent, '_last_conversation', [])
+    if not conversation:
+        buf.write("*No conversation recorded*\n\n")
+    else:
+        for i, msg in enumerate(conversation):
+            role, content, metadata = msg.role, msg.content, msg.metadata
+            if role == USER_ROLE:
+                if i == 0:
+                    buf.write("### 👤 User Query\n\n")
+                else:
+                    buf.write(f"### 👤 System Feedback (Attempt {i//2})\n\n")
+                buf.write(f"{content}\n\n")
+            else:  # ASSISTANT
+                buf.write(f"### 🤖 Assistant Response (Attempt {i//2 + 1})\n\n")
+                
+                # Try to extract and format JSON content
+                pretty_json = format_json_content(content)
+                if pretty_json is not None:
+                    buf.write("**Response JSON:**\n\n")
+                    buf.write("```json\n")
+                    buf.write(pretty_json)
+                    buf.write("\n```\n\n")
+                else:
+                    buf.write(f"{content}\n\n")
+                
+                # Show the query if available in metadata
+                if "query" in metadata:
+                    buf.write("**Generated Query:**\n\n")
+                    buf.write("```cypher\n")
+                    # Clean up the query by replacing escaped quotes and newlines
+                    query = unescape_query(metadata["query"])
+                    buf.write(query)
+                    buf.write("\n```\n\n")
+                
+                buf.write("---\n\n")
+    
+    # Write to a temporary file and swap it in so readers never see a partial report
+    tmp_file = f"{output_file}.tmp"
+    Path(tmp_file).write_text(buf.getvalue(), encoding="utf-8")
+    os.replace(tmp_file, output_file)
+    
     logger.info(f"Results saved to {output_file}")
     
     return result
 
 if __name__ == "__main__":
-    asyncio.run(test_forced_feedback())
+    run_async(test_forced_feedback())
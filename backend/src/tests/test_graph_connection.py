@@ -10,12 +10,18 @@ Usage:
 import os
 import sys
 import json
+import time
 import asyncio
+import hashlib
 import logging
+from pathlib import Path
 from dotenv import load_dotenv
 from typing import Dict, List, Tuple, Optional, Any
 import httpx
 
+from _compat import run_async, loads_json, dumps_pretty, HTTP2_AVAILABLE
+from _colors import GREEN, RED, YELLOW, RESET
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,44 +29,64 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Add some color to logs if supported
-try:
-    import colorama
-    colorama.init()
-    GREEN = colorama.Fore.GREEN
-    RED = colorama.Fore.RED
-    YELLOW = colorama.Fore.YELLOW
-    RESET = colorama.Style.RESET_ALL
-except ImportError:
-    GREEN = ""
-    RED = ""
-    YELLOW = ""
-    RESET = ""
-
 # Load environment variables
 load_dotenv()
 
 # Knowledge Graph API configuration
-KG_API_URL = os.getenv("KG_API_URL")
+# Normalized once here so no helper needs to strip a trailing slash
+KG_API_URL = (os.getenv("KG_API_URL") or "").rstrip('/')
+
+# On-disk cache of the discovered graph query endpoint, keyed by API URL
+ENDPOINT_CACHE_FILE = Path(
+    os.getenv("KG_ENDPOINT_CACHE_FILE", Path.home() / ".cache" / "dengue-agents" / "kg_endpoints.json")
+)
+ENDPOINT_CACHE_TTL = 3600  # seconds
+
+# Total time budget for the endpoint discovery sweep, in seconds
+DISCOVERY_TIMEOUT = 5.0
+
+# Connection pool limits for the shared HTTP client
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=20)
+
+# Simple query used to check whether an endpoint accepts graph queries
+GRAPH_PROBE_QUERY = {
+    "query": "MATCH (n) RETURN count(n) as count LIMIT 1"
+}
+
+def has_positive_count(result: Dict) -> bool:
+    """Check that a count query returned at least one match."""
+    return result.get("count", 0) > 0
+
+def has_node_types(result: Dict) -> bool:
+    """Check that node labels were returned."""
+    return "node_types" in result and len(result["node_types"]) > 0
+
+def has_symptom(result: Dict) -> bool:
+    """Check that a symptom was returned."""
+    return "symptom" in result
+
+def has_relationship_counts(result: Dict) -> bool:
+    """Check that relationship types and their counts were returned."""
+    return "relationship_type" in result and "count" in result
 
 # Test queries
 TEST_QUERIES = [
     {
         "name": "Count all nodes",
         "query": "MATCH (n) RETURN count(n) as count",
-        "expected": lambda result: result.get("count", 0) > 0,
+        "expected": has_positive_count,
         "error_message": "No nodes found in the database"
     },
     {
         "name": "Count dengue nodes",
         "query": "MATCH (n:Disease {name: 'Dengue Fever'}) RETURN count(n) as count",
-        "expected": lambda result: result.get("count", 0) > 0,
+        "expected": has_positive_count,
         "error_message": "No Dengue Fever nodes found"
     },
     {
         "name": "Get node types",
         "query": "MATCH (n) RETURN distinct labels(n) as node_types LIMIT 5",
-        "expected": lambda result: "node_types" in result and len(result["node_types"]) > 0,
+        "expected": has_node_types,
         "error_message": "No node types found"
     },
     {
@@ -70,7 +96,7 @@ TEST_QUERIES = [
         RETURN s.name as symptom
         LIMIT 5
         """,
-        "expected": lambda result: "symptom" in result,
+        "expected": has_symptom,
         "error_message": "No symptoms found for Dengue Fever"
     },
     {
@@ -81,26 +107,61 @@ TEST_QUERIES = [
         ORDER BY count DESC
         LIMIT 5
         """,
-        "expected": lambda result: "relationship_type" in result and "count" in result,
+        "expected": has_relationship_counts,
         "error_message": "No relationships found"
     }
 ]
 
-async def discover_graph_api_endpoints(base_url: str) -> List[str]:
+def _endpoint_cache_key(base_url: str) -> str:
+    """Build the cache key for a Knowledge Graph API base URL."""
+    return hashlib.sha1(base_url.encode()).hexdigest()
+
+def _load_endpoint_cache() -> Dict[str, Any]:
+    """Load the endpoint cache, returning an empty cache if it's missing or unreadable."""
+    try:
+        with open(ENDPOINT_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_endpoint_cache(cache: Dict[str, Any]) -> None:
+    """Persist the endpoint cache, ignoring write failures."""
+    try:
+        ENDPOINT_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(ENDPOINT_CACHE_FILE, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not save endpoint cache: {str(e)}")
+
+def get_cached_graph_endpoint(base_url: str) -> Optional[str]:
+    """Return the cached graph query endpoint for base_url if it hasn't expired."""
+    entry = _load_endpoint_cache().get(_endpoint_cache_key(base_url))
+    if entry and time.time() - entry.get("timestamp", 0) < ENDPOINT_CACHE_TTL:
+        return entry.get("endpoint")
+    return None
+
+def cache_graph_endpoint(base_url: str, endpoint: str) -> None:
+    """Remember the working graph query endpoint for base_url."""
+    cache = _load_endpoint_cache()
+    cache[_endpoint_cache_key(base_url)] = {
+        "endpoint": endpoint,
+        "timestamp": time.time()
+    }
+    _save_endpoint_cache(cache)
+
+async def discover_graph_api_endpoints(client: httpx.AsyncClient, base_url: str) -> List[str]:
     """
     Discover available API endpoints for the Knowledge Graph API.
     
     Args:
-        base_url: Base URL of the Knowledge Graph API
+        client: Shared HTTP client
+        base_url: Base URL of the Knowledge Graph API, without a trailing slash
         
     Returns:
         List of discovered endpoints
     """
     discovered_endpoints = []
     
-    # Ensure URL has no trailing slash
-    base_url = base_url.rstrip('/')
-    
     # Common API endpoints to try
     endpoints_to_try = [
         "/",
@@ -116,27 +177,38 @@ async def discover_graph_api_endpoints(base_url: str) -> List[str]:
     
     logger.info(f"Discovering available endpoints at {base_url}...")
     
-    for endpoint in endpoints_to_try:
-        endpoint_url = f"{base_url}{endpoint}"
-        
+    async def probe(endpoint: str) -> Optional[int]:
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(endpoint_url)
-                
-            # If successful, add to discovered endpoints
-            if response.status_code < 400:  # Anything not an error (200-399)
-                discovered_endpoints.append(endpoint)
-                logger.info(f"Discovered endpoint: {endpoint} (Status: {response.status_code})")
+            # No per-request timeout; the sweep as a whole is bounded by DISCOVERY_TIMEOUT
+            response = await client.get(f"{base_url}{endpoint}", timeout=None)
+            return response.status_code
         except Exception:
             # Ignore errors during discovery
-            pass
+            return None
+    
+    # Probe all endpoints concurrently under a single deadline so one slow endpoint
+    # doesn't hold up the rest; anything still pending at the deadline is cancelled
+    tasks = [asyncio.create_task(probe(endpoint)) for endpoint in endpoints_to_try]
+    done, pending = await asyncio.wait(tasks, timeout=DISCOVERY_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    status_codes = [task.result() if task in done else None for task in tasks]
+    
+    for endpoint, status_code in zip(endpoints_to_try, status_codes):
+        # If successful, add to discovered endpoints
+        if status_code is not None and status_code < 400:  # Anything not an error (200-399)
+            discovered_endpoints.append(endpoint)
+            logger.info(f"Discovered endpoint: {endpoint} (Status: {status_code})")
     
     return discovered_endpoints
 
-async def test_kg_api_connection() -> Tuple[bool, str, List[str]]:
+async def test_kg_api_connection(client: httpx.AsyncClient) -> Tuple[bool, str, List[str]]:
     """
     Test Knowledge Graph API connection and discover available endpoints.
     
+    Args:
+        client: Shared HTTP client
+        
     Returns:
         Tuple of (success, details, discovered_endpoints)
     """
@@ -144,19 +216,16 @@ async def test_kg_api_connection() -> Tuple[bool, str, List[str]]:
         if not KG_API_URL:
             return False, "Knowledge Graph API URL not found in environment variables", []
         
-        # Ensure URL has no trailing slash
-        base_url = KG_API_URL.rstrip('/')
-        health_url = f"{base_url}/health"
+        health_url = f"{KG_API_URL}/health"
         
         # Test the health endpoint
         logger.info(f"Testing health endpoint: {health_url}")
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(health_url)
-            
+        response = await client.get(health_url, timeout=10.0)
+        
         if response.status_code == 200:
             # Discover available endpoints
-            discovered_endpoints = await discover_graph_api_endpoints(base_url)
+            discovered_endpoints = await discover_graph_api_endpoints(client, KG_API_URL)
             return True, f"Successfully connected to Knowledge Graph API at {KG_API_URL}", discovered_endpoints
         else:
             return False, f"API returned status code {response.status_code}: {response.text}", []
@@ -164,19 +233,56 @@ async def test_kg_api_connection() -> Tuple[bool, str, List[str]]:
     except Exception as e:
         return False, f"Error connecting to Knowledge Graph API: {str(e)}", []
 
-async def find_graph_query_endpoint(base_url: str) -> Tuple[bool, str, Optional[str]]:
+async def probe_graph_query_endpoint(client: httpx.AsyncClient, base_url: str, endpoint: str) -> bool:
+    """
+    Check whether an endpoint accepts graph queries.
+    
+    Args:
+        client: Shared HTTP client
+        base_url: Base URL of the Knowledge Graph API, without a trailing slash
+        endpoint: Endpoint path to check
+        
+    Returns:
+        True if the endpoint returned a valid graph query response
+    """
+    endpoint_url = f"{base_url}{endpoint}"
+    logger.info(f"Testing graph query endpoint: {endpoint_url}")
+    
+    try:
+        response = await client.post(
+            endpoint_url,
+            json=GRAPH_PROBE_QUERY,
+            timeout=10.0
+        )
+        
+        # Log response status
+        logger.info(f"Response status: {response.status_code}")
+        
+        # If successful, check the endpoint
+        if response.status_code == 200:
+            try:
+                # Try to parse the response to verify it's a valid graph response
+                result = loads_json(response.content)
+                
+                # Check if it's a valid response with results
+                return "results" in result or "count" in result
+            except Exception as e:
+                logger.warning(f"Endpoint returned 200 but couldn't parse JSON: {str(e)}")
+    except Exception as e:
+        logger.warning(f"Error testing endpoint {endpoint}: {str(e)}")
+    return False
+
+async def find_graph_query_endpoint(client: httpx.AsyncClient, base_url: str) -> Tuple[bool, str, Optional[str]]:
     """
     Find the correct endpoint for executing graph queries.
     
     Args:
-        base_url: Base URL of the Knowledge Graph API
+        client: Shared HTTP client
+        base_url: Base URL of the Knowledge Graph API, without a trailing slash
         
     Returns:
         Tuple of (success, message, endpoint_path)
     """
-    # Ensure URL has no trailing slash
-    base_url = base_url.rstrip('/')
-    
     # Try different endpoint variations to find the correct one for graph queries
     possible_endpoints = [
         "/graph/query",
@@ -188,49 +294,36 @@ async def find_graph_query_endpoint(base_url: str) -> Tuple[bool, str, Optional[
         "/api/query"
     ]
     
-    # Simple test query
-    query_data = {
-        "query": "MATCH (n) RETURN count(n) as count LIMIT 1"
-    }
+    # Reuse a previously discovered endpoint if it still works
+    cached_endpoint = get_cached_graph_endpoint(base_url)
+    if cached_endpoint and await probe_graph_query_endpoint(client, base_url, cached_endpoint):
+        return True, f"Using cached graph query endpoint: {cached_endpoint}", cached_endpoint
     
-    for endpoint in possible_endpoints:
-        endpoint_url = f"{base_url}{endpoint}"
-        logger.info(f"Testing graph query endpoint: {endpoint_url}")
-        
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    endpoint_url,
-                    json=query_data
-                )
-                
-            # Log response status
-            logger.info(f"Response status: {response.status_code}")
-            
-            # If successful, return endpoint
-            if response.status_code == 200:
-                try:
-                    # Try to parse the response to verify it's a valid graph response
-                    result = response.json()
-                    
-                    # Check if it's a valid response with results
-                    if "results" in result or "count" in result:
-                        return True, f"Found working graph query endpoint: {endpoint}", endpoint
-                except Exception as e:
-                    logger.warning(f"Endpoint returned 200 but couldn't parse JSON: {str(e)}")
-                    continue
-        except Exception as e:
-            logger.warning(f"Error testing endpoint {endpoint}: {str(e)}")
-            continue
+    async def probe(endpoint: str) -> Tuple[bool, str]:
+        return await probe_graph_query_endpoint(client, base_url, endpoint), endpoint
+    
+    # Probe all candidates concurrently and stop at the first one that works
+    tasks = [asyncio.create_task(probe(endpoint)) for endpoint in possible_endpoints]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            is_working, endpoint = await next_done
+            if is_working:
+                cache_graph_endpoint(base_url, endpoint)
+                return True, f"Found working graph query endpoint: {endpoint}", endpoint
+    finally:
+        # Cancel any probes still in flight once we have an answer
+        for task in tasks:
+            task.cancel()
             
     # If we've tried all endpoints and none worked
     return False, "Could not find working graph query endpoint", None
 
-async def run_test_query(query_info: Dict, graph_endpoint: str) -> Tuple[bool, Dict, str]:
+async def run_test_query(client: httpx.AsyncClient, query_info: Dict, graph_endpoint: str) -> Tuple[bool, Dict, str]:
     """
     Run a test query against the Knowledge Graph API.
     
     Args:
+        client: Shared HTTP client
         query_info: Dictionary with query information
         graph_endpoint: Graph query endpoint path
         
@@ -241,9 +334,7 @@ async def run_test_query(query_info: Dict, graph_endpoint: str) -> Tuple[bool, D
         if not KG_API_URL:
             return False, {}, "Knowledge Graph API URL not found in environment variables"
             
-        # Ensure URL has no trailing slash
-        base_url = KG_API_URL.rstrip('/')
-        query_url = f"{base_url}{graph_endpoint}"
+        query_url = f"{KG_API_URL}{graph_endpoint}"
         
         # Prepare query payload
         payload = {
@@ -254,15 +345,15 @@ async def run_test_query(query_info: Dict, graph_endpoint: str) -> Tuple[bool, D
         logger.info(f"Endpoint: {query_url}")
         
         # Execute query
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                query_url,
-                json=payload
-            )
-            
+        response = await client.post(
+            query_url,
+            json=payload,
+            timeout=15.0
+        )
+        
         # Check response
         if response.status_code == 200:
-            result_data = response.json()
+            result_data = loads_json(response.content)
             
             # Try different result formats
             if "results" in result_data and len(result_data["results"]) > 0:
@@ -288,56 +379,58 @@ async def main() -> None:
     print(" KNOWLEDGE GRAPH API CONNECTION TEST ".center(60, "="))
     print("=" * 60)
     
-    # Test basic connection and discover endpoints
-    connection_success, connection_message, discovered_endpoints = await test_kg_api_connection()
-    
-    if connection_success:
-        print(f"{GREEN}✅ Connection test:{RESET} {connection_message}")
-        
-        if discovered_endpoints:
-            print(f"\nDiscovered API endpoints:")
-            for endpoint in discovered_endpoints:
-                print(f"  - {endpoint}")
-        
-        # Find the graph query endpoint
-        logger.info("\nDiscovering graph query endpoint...")
-        endpoint_success, endpoint_message, graph_endpoint = await find_graph_query_endpoint(KG_API_URL)
+    # Share one pooled client across the health check, discovery and queries
+    async with httpx.AsyncClient(timeout=10.0, limits=HTTP_LIMITS, http2=HTTP2_AVAILABLE) as client:
+        # Test basic connection and discover endpoints
+        connection_success, connection_message, discovered_endpoints = await test_kg_api_connection(client)
         
-        if endpoint_success:
-            print(f"{GREEN}✅ Endpoint discovery:{RESET} {endpoint_message}")
+        if connection_success:
+            print(f"{GREEN}✅ Connection test:{RESET} {connection_message}")
             
-            # Run test queries
-            all_queries_passed = True
+            if discovered_endpoints:
+                print(f"\nDiscovered API endpoints:")
+                for endpoint in discovered_endpoints:
+                    print(f"  - {endpoint}")
             
-            for i, query_info in enumerate(TEST_QUERIES):
-                print(f"\nRunning query {i+1}: {query_info['name']}")
-                print(f"Query: {query_info['query'].strip()}")
+            # Find the graph query endpoint
+            logger.info("\nDiscovering graph query endpoint...")
+            endpoint_success, endpoint_message, graph_endpoint = await find_graph_query_endpoint(client, KG_API_URL)
+            
+            if endpoint_success:
+                print(f"{GREEN}✅ Endpoint discovery:{RESET} {endpoint_message}")
+                
+                # Run test queries
+                all_queries_passed = True
                 
-                success, result, error = await run_test_query(query_info, graph_endpoint)
+                for i, query_info in enumerate(TEST_QUERIES):
+                    print(f"\nRunning query {i+1}: {query_info['name']}")
+                    print(f"Query: {query_info['query'].strip()}")
+                    
+                    success, result, error = await run_test_query(client, query_info, graph_endpoint)
+                    
+                    if success:
+                        print(f"{GREEN}✅ Query succeeded:{RESET}")
+                        print(dumps_pretty(result))
+                    else:
+                        all_queries_passed = False
+                        print(f"{RED}❌ Query failed:{RESET} {error}")
+                        if result:
+                            print(f"Result: {dumps_pretty(result)}")
                 
-                if success:
-                    print(f"{GREEN}✅ Query succeeded:{RESET}")
-                    print(json.dumps(result, indent=2))
+                print("\n" + "=" * 60)
+                if all_queries_passed:
+                    print(f"{GREEN}🎉 All Knowledge Graph API test queries passed!{RESET}")
                 else:
-                    all_queries_passed = False
-                    print(f"{RED}❌ Query failed:{RESET} {error}")
-                    if result:
-                        print(f"Result: {json.dumps(result, indent=2)}")
-            
-            print("\n" + "=" * 60)
-            if all_queries_passed:
-                print(f"{GREEN}🎉 All Knowledge Graph API test queries passed!{RESET}")
+                    print(f"{YELLOW}⚠️  Some Knowledge Graph API test queries failed. Check the logs for details.{RESET}")
             else:
-                print(f"{YELLOW}⚠️  Some Knowledge Graph API test queries failed. Check the logs for details.{RESET}")
+                print(f"{RED}❌ Endpoint discovery failed:{RESET} {endpoint_message}")
+                print("\n" + "=" * 60)
+                print(f"{RED}⚠️  Could not find a working graph query endpoint.{RESET}")
         else:
-            print(f"{RED}❌ Endpoint discovery failed:{RESET} {endpoint_message}")
+            print(f"{RED}❌ Connection test failed:{RESET} {connection_message}")
             print("\n" + "=" * 60)
-            print(f"{RED}⚠️  Could not find a working graph query endpoint.{RESET}")
-    else:
-        print(f"{RED}❌ Connection test failed:{RESET} {connection_message}")
-        print("\n" + "=" * 60)
-        print(f"{RED}⚠️  Could not connect to the Knowledge Graph API.{RESET}")
-    
+            print(f"{RED}⚠️  Could not connect to the Knowledge Graph API.{RESET}")
+        
     print("=" * 60 + "\n")
     
     # Exit with error code if connection failed
@@ -348,4 +441,4 @@ async def main() -> None:
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
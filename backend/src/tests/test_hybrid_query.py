@@ -6,19 +6,27 @@ two-step as fallback, with schema validation for query correctness.
 """
 import os
 import sys
-import json
 import logging
 import asyncio
 from pathlib import Path
 
+from _compat import run_async
+
 # Add the project root to the Python path
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
 from src.agent_system.rag_system.query.hybrid_query_writer_agent import HybridQueryWriterAgent
 from src.agent_system.core.message import Message, MessageRole
+from src.utils.model_caller import GRANITE_INSTRUCT_MODEL
+from src.utils.query_cache import QueryCache
+from src.registries.prompt_registry import PromptRegistry
+from _report import APPROACH_RESULT_TEMPLATE, format_result
 
-# Configure logging
+# Configure logging; per-query chatter is at DEBUG so concurrent runs stay readable.
+# Thread and process info isn't in the format, so skip collecting it per record
+logging.logThreads = False
+logging.logProcesses = False
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -44,34 +52,45 @@ TEST_QUERIES = [
     "What are the complications of dengue fever?"
 ]
 
-async def test_hybrid_query_writer_agent(query: str):
+# Maximum number of queries in flight against the LLM at once
+MAX_CONCURRENT_QUERIES = int(os.getenv("TEST_CONCURRENCY", "8"))
+
+# Configuration for the HybridQueryWriterAgent under test (greedy decoding so
+# repeated runs send identical requests and the backend's prefix cache can hit)
+AGENT_CONFIG = {
+    "agent_id": "test_hybrid_query_writer_agent",
+    "class_name": "HybridQueryWriterAgent",
+    "model_config": {
+        "model_type": "instruct",
+        "temperature": 0.0,
+        "max_tokens": 1024
+    },
+    "max_icl_attempts": 2  # Set to 2 for faster testing
+}
+
+# Prompts used by the hybrid agent's ICL and two-step sub-agents; their text is
+# part of the query cache key so prompt edits invalidate cached results
+PROMPT_IDS = ("rag.icl_graph_query_generator", "rag.graph_query_generator")
+
+def create_agent() -> HybridQueryWriterAgent:
+    """Create the HybridQueryWriterAgent shared by all test queries."""
+    return HybridQueryWriterAgent(
+        agent_id="test_hybrid_query_writer_agent", 
+        config=AGENT_CONFIG
+    )
+
+async def test_hybrid_query_writer_agent(agent: HybridQueryWriterAgent, query: str):
     """
     Test the HybridQueryWriterAgent with a specific query.
     
     Args:
+        agent: The HybridQueryWriterAgent to run the query through
         query: The query to test
         
     Returns:
         Generated cypher query string and approach used
     """
-    logger.info(f"Testing query: {query}")
-    
-    # Initialize the HybridQueryWriterAgent
-    agent_config = {
-        "agent_id": "test_hybrid_query_writer_agent",
-        "class_name": "HybridQueryWriterAgent",
-        "model_config": {
-            "model_type": "instruct",
-            "temperature": 0.1,
-            "max_tokens": 1024
-        },
-        "max_icl_attempts": 2  # Set to 2 for faster testing
-    }
-    
-    agent = HybridQueryWriterAgent(
-        agent_id="test_hybrid_query_writer_agent", 
-        config=agent_config
-    )
+    logger.debug(f"Testing query: {query}")
     
     # Create a message from the query
     message = Message(
@@ -82,70 +101,98 @@ async def test_hybrid_query_writer_agent(query: str):
     # Process the message
     response_message, next_agent = await agent.process(message)
     
-    # Extract the query information
-    query_data = {}
-    try:
-        query_data = json.loads(response_message.content)
-    except json.JSONDecodeError:
-        logger.warning(f"Could not parse response content as JSON: {response_message.content}")
-    
     generated_query = response_message.metadata.get("query", "No query generated")
     approach = response_message.metadata.get("approach", "unknown")
     
-    logger.info(f"Generated query using {approach} approach: {generated_query}")
+    logger.debug(f"Generated query using {approach} approach: {generated_query}")
     
     return generated_query, approach
 
-async def run_tests():
-    """Run tests for all queries and save results."""
-    results = []
+async def run_tests(use_cache: bool = True):
+    """
+    Run tests for all queries and save results.
+    
+    Args:
+        use_cache: Reuse previously generated queries from the on-disk cache
+    """
+    # Build the agent once and reuse it for every query
+    agent = create_agent()
+    cache = QueryCache() if use_cache else None
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+    # Prompt text is part of the cache key, so only load it when the cache is used
+    prompt_text = "\n".join(PromptRegistry().get_prompt(prompt_id) for prompt_id in PROMPT_IDS) if cache is not None else ""
     
-    for query in TEST_QUERIES:
+    async def run_one(query: str):
+        key = QueryCache.make_key(AGENT_CONFIG, GRANITE_INSTRUCT_MODEL, query, prompt_text)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            logger.info(f"Using cached result for '{query}'")
+            return {
+                "query": query,
+                "cached": True,
+                "generated_query": cached[0],
+                "approach": cached[1]
+            }
+        
         try:
-            generated_query, approach = await test_hybrid_query_writer_agent(query)
-            results.append({
+            async with semaphore:
+                generated_query, approach = await test_hybrid_query_writer_agent(agent, query)
+            if cache is not None:
+                cache.set(key, [generated_query, approach])
+            result = {
                 "query": query,
                 "generated_query": generated_query,
                 "approach": approach
-            })
+            }
             logger.info(f"Test for '{query}' completed successfully")
-            logger.info("-" * 80)
+            logger.debug("-" * 80)
         except Exception as e:
             logger.error(f"Error testing query '{query}': {str(e)}")
-            results.append({
+            result = {
                 "query": query,
                 "error": str(e)
-            })
+            }
+        return result
+    
+    # Run all queries concurrently; gather keeps results in TEST_QUERIES order
+    results = await asyncio.gather(*(run_one(query) for query in TEST_QUERIES))
+    if cache is not None:
+        cache.save()
+        cache_hits = sum(1 for result in results if result.get("cached"))
+        logger.info(f"Reused {cache_hits}/{len(results)} results from the query cache (--no-cache to regenerate)")
     
     # Save results to a file
     output_file = os.path.join(project_root, "hybrid_query_results.md")
-    with open(output_file, "w") as f:
-        f.write("# Hybrid Query Generation Test Results\n\n")
-        
-        for i, result in enumerate(results):
-            f.write(f"## Query {i+1}: {result['query']}\n\n")
-            
-            if "error" in result:
-                f.write(f"**Error:** {result['error']}\n\n")
-            else:
-                f.write(f"**Approach Used:** {result.get('approach', 'unknown')}\n\n")
-                f.write("**Generated Cypher Query:**\n\n")
-                f.write("```cypher\n")
-                f.write(result.get('generated_query', 'No query generated'))
-                f.write("\n```\n\n")
-            
-            f.write("---\n\n")
+    parts = ["# Hybrid Query Generation Test Results\n\n"]
+    parts.extend(
+        format_result(i, result, APPROACH_RESULT_TEMPLATE) for i, result in enumerate(results)
+    )
+    # Write off the event loop so a slow disk doesn't stall it
+    await asyncio.to_thread(Path(output_file).write_text, "".join(parts))
     
     logger.info(f"Results saved to {output_file}")
     
     return results
 
+def parse_args():
+    """Parse command line arguments."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Test hybrid graph query generation")
+    parser.add_argument("query", nargs="*",
+                        help="Single query to test (runs all TEST_QUERIES when omitted)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached results and call the LLM for every query")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    # Get command line arguments
-    if len(sys.argv) > 1:
+    args = parse_args()
+    query = " ".join(args.query)
+    
+    if query:
         # Run test with a single query
-        query = " ".join(sys.argv[1:])
-        asyncio.run(test_hybrid_query_writer_agent(query))
+        logger.setLevel(logging.DEBUG)
+        run_async(test_hybrid_query_writer_agent(create_agent(), query))
     else:
         # Run all tests
-        asyncio.run(run_tests())
+        run_async(run_tests(use_cache=not args.no_cache))
@@ -11,14 +11,23 @@ import logging
 import asyncio
 from pathlib import Path
 
+from _compat import run_async, loads_json
+
 # Add the project root to the Python path
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
 from src.agent_system.rag_system.query.icl_graph_query_writer_agent import ICLGraphQueryWriterAgent
 from src.agent_system.core.message import Message, MessageRole
+from src.utils.model_caller import GRANITE_INSTRUCT_MODEL
+from src.utils.query_cache import QueryCache
+from src.registries.prompt_registry import PromptRegistry
+from _report import format_result
 
-# Configure logging
+# Configure logging; per-query chatter is at DEBUG so concurrent runs stay readable.
+# Thread and process info isn't in the format, so skip collecting it per record
+logging.logThreads = False
+logging.logProcesses = False
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -42,34 +51,57 @@ TEST_QUERIES = [
     "What are the complications of dengue fever?"
 ]
 
-async def test_icl_query_writer_agent(query: str):
+# Maximum number of queries in flight against the LLM at once
+MAX_CONCURRENT_QUERIES = int(os.getenv("TEST_CONCURRENCY", "8"))
+
+# Configuration for the ICLGraphQueryWriterAgent under test (temperature 0 keeps
+# reruns deterministic and cache-friendly on the model server)
+AGENT_CONFIG = {
+    "agent_id": "test_icl_query_writer_agent",
+    "prompt_id": "rag.icl_graph_query_generator",
+    "class_name": "ICLGraphQueryWriterAgent",
+    "model_config": {
+        "model_type": "instruct",
+        "temperature": 0.0,
+        "max_tokens": 1024
+    }
+}
+
+# Configuration for the two-step QueryWriterAgent used by compare_approaches
+TWO_STEP_AGENT_CONFIG = {
+    "agent_id": "test_two_step_query_writer_agent",
+    "prompt_id": "rag.graph_query_generator",
+    "class_name": "QueryWriterAgent",
+    "model_config": {
+        "model_type": "instruct",
+        "temperature": 0.0,
+        "max_tokens": 1024
+    }
+}
+
+# Prompt used by the agent under test; its text is part of the query cache key
+# so prompt edits invalidate cached results
+PROMPT_IDS = (AGENT_CONFIG["prompt_id"],)
+
+def create_agent() -> ICLGraphQueryWriterAgent:
+    """Create the ICLGraphQueryWriterAgent shared by all test queries."""
+    return ICLGraphQueryWriterAgent(
+        agent_id="test_icl_query_writer_agent", 
+        config=AGENT_CONFIG
+    )
+
+async def test_icl_query_writer_agent(agent: ICLGraphQueryWriterAgent, query: str):
     """
     Test the ICLGraphQueryWriterAgent with a specific query.
     
     Args:
+        agent: The ICLGraphQueryWriterAgent to run the query through
         query: The query to test
         
     Returns:
         Generated cypher query string
     """
-    logger.info(f"Testing query: {query}")
-    
-    # Initialize the ICLGraphQueryWriterAgent
-    agent_config = {
-        "agent_id": "test_icl_query_writer_agent",
-        "prompt_id": "rag.icl_graph_query_generator",
-        "class_name": "ICLGraphQueryWriterAgent",
-        "model_config": {
-            "model_type": "instruct",
-            "temperature": 0.1,
-            "max_tokens": 1024
-        }
-    }
-    
-    agent = ICLGraphQueryWriterAgent(
-        agent_id="test_icl_query_writer_agent", 
-        config=agent_config
-    )
+    logger.debug(f"Testing query: {query}")
     
     # Create a message from the query
     message = Message(
@@ -80,58 +112,77 @@ async def test_icl_query_writer_agent(query: str):
     # Process the message
     response_message, next_agent = await agent.process(message)
     
-    # Extract the query information
-    query_data = {}
+    # Extract the query information (orjson.JSONDecodeError subclasses the stdlib one)
+    reasoning = "No reasoning provided"
     try:
-        query_data = json.loads(response_message.content)
+        reasoning = loads_json(response_message.content).get("reasoning", reasoning)
     except json.JSONDecodeError:
         logger.warning(f"Could not parse response content as JSON: {response_message.content}")
     
     generated_query = response_message.metadata.get("query", "No query generated")
-    reasoning = query_data.get("reasoning", "No reasoning provided")
     
-    logger.info(f"Generated query: {generated_query}")
-    logger.info(f"Reasoning: {reasoning}")
+    logger.debug(f"Generated query: {generated_query}")
+    logger.debug(f"Reasoning: {reasoning}")
     
     return generated_query
 
-async def run_tests():
-    """Run tests for all queries and save results."""
-    results = []
+async def run_tests(use_cache: bool = True):
+    """
+    Run tests for all queries and save results.
     
-    for query in TEST_QUERIES:
+    Args:
+        use_cache: Reuse previously generated queries from the on-disk cache
+    """
+    # Build the agent once and reuse it for every query
+    agent = create_agent()
+    cache = QueryCache() if use_cache else None
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+    # Prompt text is part of the cache key, so only load it when the cache is used
+    prompt_text = "\n".join(PromptRegistry().get_prompt(prompt_id) for prompt_id in PROMPT_IDS) if cache is not None else ""
+    
+    async def run_one(query: str):
+        key = QueryCache.make_key(AGENT_CONFIG, GRANITE_INSTRUCT_MODEL, query, prompt_text)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            logger.info(f"Using cached result for '{query}'")
+            return {
+                "query": query,
+                "cached": True,
+                "generated_query": cached
+            }
+        
         try:
-            generated_query = await test_icl_query_writer_agent(query)
-            results.append({
+            async with semaphore:
+                generated_query = await test_icl_query_writer_agent(agent, query)
+            if cache is not None:
+                cache.set(key, generated_query)
+            result = {
                 "query": query,
                 "generated_query": generated_query
-            })
+            }
             logger.info(f"Test for '{query}' completed successfully")
-            logger.info("-" * 80)
+            logger.debug("-" * 80)
         except Exception as e:
             logger.error(f"Error testing query '{query}': {str(e)}")
-            results.append({
+            result = {
                 "query": query,
                 "error": str(e)
-            })
+            }
+        return result
+    
+    # Run all queries concurrently; gather keeps results in TEST_QUERIES order
+    results = await asyncio.gather(*(run_one(query) for query in TEST_QUERIES))
+    if cache is not None:
+        cache.save()
+        cache_hits = sum(1 for result in results if result.get("cached"))
+        logger.info(f"Reused {cache_hits}/{len(results)} results from the query cache (--no-cache to regenerate)")
     
     # Save results to a file
     output_file = os.path.join(project_root, "icl_query_results.md")
-    with open(output_file, "w") as f:
-        f.write("# ICL Graph Query Generation Test Results\n\n")
-        
-        for i, result in enumerate(results):
-            f.write(f"## Query {i+1}: {result['query']}\n\n")
-            
-            if "error" in result:
-                f.write(f"**Error:** {result['error']}\n\n")
-            else:
-                f.write("**Generated Cypher Query:**\n\n")
-                f.write("```cypher\n")
-                f.write(result.get('generated_query', 'No query generated'))
-                f.write("\n```\n\n")
-            
-            f.write("---\n\n")
+    parts = ["# ICL Graph Query Generation Test Results\n\n"]
+    parts.extend(format_result(i, result) for i, result in enumerate(results))
+    # Write off the event loop so a slow disk doesn't stall it
+    await asyncio.to_thread(Path(output_file).write_text, "".join(parts))
     
     logger.info(f"Results saved to {output_file}")
     
@@ -150,37 +201,12 @@ async def compare_approaches(query: str):
     logger.info(f"Comparing approaches for query: {query}")
     
     # Initialize the ICL agent
-    icl_agent_config = {
-        "agent_id": "test_icl_query_writer_agent",
-        "prompt_id": "rag.icl_graph_query_generator",
-        "class_name": "ICLGraphQueryWriterAgent",
-        "model_config": {
-            "model_type": "instruct",
-            "temperature": 0.1,
-            "max_tokens": 1024
-        }
-    }
-    
-    icl_agent = ICLGraphQueryWriterAgent(
-        agent_id="test_icl_query_writer_agent", 
-        config=icl_agent_config
-    )
+    icl_agent = create_agent()
     
     # Initialize the two-step agent
-    two_step_agent_config = {
-        "agent_id": "test_two_step_query_writer_agent",
-        "prompt_id": "rag.graph_query_generator",
-        "class_name": "QueryWriterAgent",
-        "model_config": {
-            "model_type": "instruct",
-            "temperature": 0.1,
-            "max_tokens": 1024
-        }
-    }
-    
     two_step_agent = QueryWriterAgent(
         agent_id="test_two_step_query_writer_agent", 
-        config=two_step_agent_config
+        config=TWO_STEP_AGENT_CONFIG
     )
     
     # Create a message from the query
@@ -229,17 +255,30 @@ async def compare_approaches(query: str):
     
     return icl_query, two_step_query
 
+def parse_args():
+    """Parse command line arguments."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Test ICL-based graph query generation")
+    parser.add_argument("query", nargs="*",
+                        help="Single query to test (runs all TEST_QUERIES when omitted)")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare the ICL and two-step approaches for the query")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached results and call the LLM for every query")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    # Get command line arguments
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--compare" and len(sys.argv) > 2:
-            # Run comparison mode with the specified query
-            query = " ".join(sys.argv[2:])
-            asyncio.run(compare_approaches(query))
-        else:
-            # Run test with a single query
-            query = " ".join(sys.argv[1:])
-            asyncio.run(test_icl_query_writer_agent(query))
+    args = parse_args()
+    query = " ".join(args.query)
+    
+    if args.compare and query:
+        # Run comparison mode with the specified query
+        run_async(compare_approaches(query))
+    elif query:
+        # Run test with a single query
+        logger.setLevel(logging.DEBUG)
+        run_async(test_icl_query_writer_agent(create_agent(), query))
     else:
         # Run all tests
-        asyncio.run(run_tests())
+        run_async(run_tests(use_cache=not args.no_cache))
@@ -9,14 +9,17 @@ Usage:
 """
 import os
 import sys
-import json
 import time
+import random
 import httpx
 import asyncio
 import logging
-from dotenv import load_dotenv
 from typing import Dict, List, Tuple, Optional, Any
 
+from _compat import run_async, loads_json, HTTP2_AVAILABLE
+from _colors import GREEN, RED, RESET
+from _secrets import mask_api_key
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,23 +27,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Add some color to logs if supported
-try:
-    import colorama
-    colorama.init()
-    GREEN = colorama.Fore.GREEN
-    RED = colorama.Fore.RED
-    YELLOW = colorama.Fore.YELLOW
-    RESET = colorama.Style.RESET_ALL
-except ImportError:
-    GREEN = ""
-    RED = ""
-    YELLOW = ""
-    RESET = ""
-
-# Load environment variables
-load_dotenv()
-
 # API configuration
 LLM_CONFIGS = [
     {
@@ -71,16 +57,95 @@ LLM_CONFIGS = [
     }
 ]
 
+# Maximum number of LLM requests in flight at once
+MAX_CONCURRENT_REQUESTS = int(os.getenv("TEST_CONCURRENCY", "8"))
+
+# Request timeout for every LLM call
+REQUEST_TIMEOUT = 15.0
+
+# Connection pool limits for the shared HTTP client
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Request streamed completions so a test can finish as soon as the answer does;
+# servers that ignore the flag and return plain JSON are still handled
+STREAM_RESPONSES = True
+
+# Retry policy: exponential backoff with random jitter between attempts
+MAX_RETRIES = 2
+RETRY_MIN_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
 def get_env_or_default(env_name: str, default: str = "") -> str:
     """Get environment variable or default value."""
     return os.getenv(env_name, default)
 
-async def test_llm_endpoint(config: Dict) -> Tuple[bool, Dict, str]:
+def backoff_delay(attempt: int) -> float:
+    """
+    Get a jittered exponential delay before retrying a failed request.
+    
+    Randomizing the wait keeps concurrent tests from retrying in lockstep
+    against an endpoint that is already overloaded.
+    
+    Args:
+        attempt: Zero-based index of the attempt that just failed
+        
+    Returns:
+        Delay in seconds
+    """
+    ceiling = min(RETRY_MAX_DELAY, RETRY_MIN_DELAY * 2 ** (attempt + 1))
+    return random.uniform(RETRY_MIN_DELAY, ceiling)
+
+async def read_chat_response(response: httpx.Response) -> Dict:
+    """
+    Read a chat completion from a streamed response.
+    
+    Server-sent events are consumed until the first choice reports a
+    finish_reason, and their content deltas are assembled into the same shape
+    as a non-streamed completion. Plain JSON responses are returned as-is.
+    
+    Args:
+        response: Open streaming response from the chat completions endpoint
+        
+    Returns:
+        Chat completion response data
+    """
+    if "text/event-stream" not in response.headers.get("content-type", ""):
+        return loads_json(await response.aread())
+    
+    model = None
+    finish_reason = None
+    content_parts = []
+    
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            break
+        
+        chunk = loads_json(payload)
+        model = model or chunk.get("model")
+        choices = chunk.get("choices") or [{}]
+        content_parts.append(choices[0].get("delta", {}).get("content") or "")
+        finish_reason = choices[0].get("finish_reason")
+        if finish_reason:
+            break
+    
+    return {
+        "model": model or "unknown",
+        "choices": [{
+            "message": {"role": "assistant", "content": "".join(content_parts)},
+            "finish_reason": finish_reason
+        }]
+    }
+
+async def test_llm_endpoint(config: Dict, client: httpx.AsyncClient) -> Tuple[bool, Dict, str]:
     """
     Test an LLM API endpoint.
     
     Args:
         config: LLM configuration dictionary
+        client: Shared HTTP client used for the request
         
     Returns:
         Tuple of (success, response_data, error_message)
@@ -118,32 +183,31 @@ async def test_llm_endpoint(config: Dict) -> Tuple[bool, Dict, str]:
                 {"role": "user", "content": config["user_prompt"]}
             ],
             "temperature": config["temperature"],
-            "max_tokens": config["max_tokens"]
+            "max_tokens": config["max_tokens"],
+            "stream": STREAM_RESPONSES
         }
         
-        # Configure timeout and retries
-        timeout_seconds = 15.0
-        max_retries = 2
-        retry_delay = 2.0
+        # Print request information once, not on every retry
+        masked_key = mask_api_key(api_key)
+        logger.info(f"Request to: {endpoint_url}")
+        logger.info(f"Using API key: {masked_key}")
+        logger.info(f"Using model: {model_id}")
         
         # Make request with retries
-        for attempt in range(max_retries + 1):
+        for attempt in range(MAX_RETRIES + 1):
             try:
                 start_time = time.time()
                 
-                # Print request information
-                masked_key = api_key[:4] + "*" * (len(api_key) - 8) + api_key[-4:]
-                logger.info(f"Request to: {endpoint_url}")
-                logger.info(f"Using API key: {masked_key}")
-                logger.info(f"Using model: {model_id}")
-                
-                # Create client with timeout
-                async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-                    response = await client.post(
-                        endpoint_url,
-                        headers=headers,
-                        json=request_data
-                    )
+                async with client.stream(
+                    "POST",
+                    endpoint_url,
+                    headers=headers,
+                    json=request_data
+                ) as response:
+                    if response.status_code == 200:
+                        response_data = await read_chat_response(response)
+                    else:
+                        await response.aread()
                 
                 end_time = time.time()
                 
@@ -153,8 +217,6 @@ async def test_llm_endpoint(config: Dict) -> Tuple[bool, Dict, str]:
                 
                 # If successful, return response
                 if response.status_code == 200:
-                    response_data = response.json()
-                    
                     # Extract the response content
                     content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
                     
@@ -165,23 +227,23 @@ async def test_llm_endpoint(config: Dict) -> Tuple[bool, Dict, str]:
                 else:
                     error_message = f"HTTP {response.status_code}: {response.text}"
                     
-                    if attempt < max_retries:
-                        logger.warning(f"{name} request failed (attempt {attempt+1}/{max_retries+1}): {error_message}")
-                        await asyncio.sleep(retry_delay)
+                    if attempt < MAX_RETRIES:
+                        logger.warning(f"{name} request failed (attempt {attempt+1}/{MAX_RETRIES+1}): {error_message}")
+                        await asyncio.sleep(backoff_delay(attempt))
                     else:
                         return False, {}, error_message
                         
             except httpx.TimeoutException:
-                if attempt < max_retries:
-                    logger.warning(f"{name} request timed out (attempt {attempt+1}/{max_retries+1})")
-                    await asyncio.sleep(retry_delay)
+                if attempt < MAX_RETRIES:
+                    logger.warning(f"{name} request timed out (attempt {attempt+1}/{MAX_RETRIES+1})")
+                    await asyncio.sleep(backoff_delay(attempt))
                 else:
-                    return False, {}, f"Request timed out after {timeout_seconds}s (tried {max_retries+1} times)"
+                    return False, {}, f"Request timed out after {REQUEST_TIMEOUT}s (tried {MAX_RETRIES+1} times)"
                     
             except Exception as e:
-                if attempt < max_retries:
-                    logger.warning(f"{name} request failed (attempt {attempt+1}/{max_retries+1}): {str(e)}")
-                    await asyncio.sleep(retry_delay)
+                if attempt < MAX_RETRIES:
+                    logger.warning(f"{name} request failed (attempt {attempt+1}/{MAX_RETRIES+1}): {str(e)}")
+                    await asyncio.sleep(backoff_delay(attempt))
                 else:
                     return False, {}, f"Error: {str(e)}"
         
@@ -191,62 +253,105 @@ async def test_llm_endpoint(config: Dict) -> Tuple[bool, Dict, str]:
     except Exception as e:
         return False, {}, f"Error: {str(e)}"
 
-async def run_all_llm_tests() -> List[Dict]:
+async def warm_up_connections(client: httpx.AsyncClient) -> None:
     """
-    Run all LLM connection tests.
+    Open pooled connections to every configured endpoint before timing requests.
+    
+    DNS, TCP and TLS setup would otherwise be counted in the first request's
+    response time. Failures are ignored; the real tests report them.
+    
+    Args:
+        client: Shared HTTP client whose pool should be warmed
+    """
+    requests = []
+    for config in LLM_CONFIGS:
+        api_key = get_env_or_default(config["api_key_env"])
+        url = get_env_or_default(config["url_env"]).rstrip('/')
+        if api_key and url:
+            requests.append(client.get(f"{url}/v1/models", headers={"Authorization": f"Bearer {api_key}"}))
+    
+    await asyncio.gather(*requests, return_exceptions=True)
+
+async def test_llm_config(config: Dict, client: httpx.AsyncClient) -> Dict:
+    """
+    Test a single LLM configuration and summarize the outcome.
     
+    Args:
+        config: LLM configuration dictionary
+        client: Shared HTTP client used for the request
+        
     Returns:
-        List of test results
+        Test result dictionary
     """
-    results = []
+    name = config["name"]
+    logger.info(f"Testing {name} connection...")
     
-    for config in LLM_CONFIGS:
-        name = config["name"]
-            
-        logger.info(f"Testing {name} connection...")
+    try:
+        success, response_data, error_message = await test_llm_endpoint(config, client)
         
-        try:
-            logger.info("-" * 60)
-            logger.info(f"TESTING: {name}")
-            logger.info("-" * 60)
-            
-            success, response_data, error_message = await test_llm_endpoint(config)
+        result = {
+            "name": name,
+            "success": success,
+            "critical": config.get("critical", True)
+        }
+        
+        if success:
+            content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            request_time = response_data.get("_request_time", 0)
             
-            result = {
-                "name": name,
-                "success": success,
-                "critical": config.get("critical", True)
-            }
+            result.update({
+                "response": content,
+                "request_time": f"{request_time:.2f}s",
+                "model": response_data.get("model", "unknown")
+            })
+        else:
+            result["error"] = error_message
             
-            if success:
-                content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                request_time = response_data.get("_request_time", 0)
-                
-                result.update({
-                    "response": content,
-                    "request_time": f"{request_time:.2f}s",
-                    "model": response_data.get("model", "unknown")
-                })
-                
-                logger.info(f"{GREEN}✅ SUCCESS!{RESET}")
-                logger.info(f"Response: \"{content}\"")
-            else:
-                result["error"] = error_message
-                logger.info(f"{RED}❌ FAILED: {error_message}{RESET}")
-                
-            results.append(result)
-            logger.info("-" * 60)
+        return result
+        
+    except Exception as e:
+        logger.exception(f"Error testing {name}")
+        return {
+            "name": name,
+            "success": False,
+            "critical": config.get("critical", True),
+            "error": f"Unexpected error: {str(e)}"
+        }
+
+async def run_all_llm_tests(client: httpx.AsyncClient) -> List[Dict]:
+    """
+    Run all LLM connection tests.
+    
+    Args:
+        client: Shared HTTP client used for every endpoint
+        
+    Returns:
+        List of test results
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    async def run_one(config: Dict) -> Dict:
+        async with semaphore:
+            return await test_llm_config(config, client)
+    
+    # Exercise all endpoints in parallel; gather keeps results in LLM_CONFIGS order
+    results = await asyncio.gather(*(run_one(config) for config in LLM_CONFIGS))
+    
+    # Log outcomes once everything has finished so each endpoint's block stays together
+    for result in results:
+        logger.info("-" * 60)
+        logger.info(f"TESTING: {result['name']}")
+        logger.info("-" * 60)
+        
+        if result["success"]:
+            logger.info(f"{GREEN}✅ SUCCESS!{RESET}")
+            logger.info(f"Response: \"{result['response']}\"")
+        else:
+            logger.info(f"{RED}❌ FAILED: {result['error']}{RESET}")
             
-        except Exception as e:
-            logger.exception(f"Error testing {name}")
-            results.append({
-                "name": name,
-                "success": False,
-                "critical": config.get("critical", True),
-                "error": f"Unexpected error: {str(e)}"
-            })
+        logger.info("-" * 60)
     
-    return results
+    return list(results)
 
 def print_test_results(results: List[Dict]) -> bool:
     """
@@ -296,12 +401,19 @@ def print_test_results(results: List[Dict]) -> bool:
 
 async def main() -> None:
     """Main function to run all tests."""
+    # Load environment variables here rather than at import time
+    from dotenv import load_dotenv
+    load_dotenv()
+    
     print("\nStarting LLM API connection tests...")
-    results = await run_all_llm_tests()
+    # One pooled client for all tests so connections are reused across endpoints
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=HTTP_LIMITS, http2=HTTP2_AVAILABLE) as client:
+        await warm_up_connections(client)
+        results = await run_all_llm_tests(client)
     critical_passed = print_test_results(results)
     
     if not critical_passed:
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
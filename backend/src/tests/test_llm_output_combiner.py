@@ -10,33 +10,48 @@ import os
 import sys
 import json
 import logging
-import asyncio
 from datetime import datetime
+from pathlib import Path
+from functools import lru_cache
 from typing import Dict, Any, Tuple
 
+from _compat import run_async
+
 # Add src directory to python path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
 src_dir = os.path.dirname(current_dir)
 if src_dir not in sys.path:
     sys.path.insert(0, os.path.dirname(src_dir))
 
-# Configure logging
+# Directory for test logs and results
 log_dir = os.path.join(os.path.dirname(src_dir), "logs", "output_combiner_tests")
-os.makedirs(log_dir, exist_ok=True)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_file = os.path.join(log_dir, f"llm_output_combiner_{timestamp}.log")
-
-# Set up logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+
 logger = logging.getLogger("llm_output_combiner_test")
 
+@lru_cache(maxsize=1)
+def _setup_logging() -> Tuple[str, str]:
+    """
+    Create the log directory and configure console and file logging.
+    
+    Runs once, when the test starts rather than at import time.
+    
+    Returns:
+        Tuple of (run timestamp, log file path)
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = os.path.join(log_dir, f"llm_output_combiner_{timestamp}.log")
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+    return timestamp, log_file
+
 # Import the necessary modules
 from src.agent_system.core.message import Message, MessageRole
 from src.agent_system.rag_system.output_combiner_agent import OutputCombinerAgent
@@ -98,9 +113,15 @@ SAMPLE_VISUALIZATION = """
 *Data for: Saudi Arabia*
 """
 
-async def stream_thinking_callback(thinking, agent_id=None, **kwargs):
-    """Stream thinking callback to log the agent's thought process."""
-    logger.info(f"Agent thinking: {thinking}")
+def stream_thinking_callback(agent_id: str, message_type: str, content: str, data: Any = None, **kwargs: Any) -> None:
+    """
+    Stream thinking callback to log the agent's thought process.
+    
+    This is a plain function because it never awaits; BaseAgent calls sync
+    callbacks directly instead of creating and awaiting a coroutine per event.
+    """
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"Agent thinking: {data if content == 'thinking' else content}")
 
 async def run_llm_combiner_test() -> Tuple[str, str]:
     """
@@ -109,6 +130,7 @@ async def run_llm_combiner_test() -> Tuple[str, str]:
     Returns:
         Tuple of (combined_content, result_file_path)
     """
+    timestamp, _ = _setup_logging()
     logger.info("Initializing OutputCombinerAgent")
     
     # Initialize schema tool
@@ -142,11 +164,12 @@ async def run_llm_combiner_test() -> Tuple[str, str]:
                 ]
             }
         },
-        "response_generator_output": SAMPLE_RESPONSE,
         "dengue_data_retrieved": True,
         "has_visualization_data": True
     }
     
+    # OutputCombinerAgent reads the response from the message content, so it is
+    # not duplicated under metadata["response_generator_output"]
     message = Message(
         role=MessageRole.USER,
         content=SAMPLE_RESPONSE,
@@ -168,8 +191,7 @@ async def run_llm_combiner_test() -> Tuple[str, str]:
     
     # Save the result to a file
     result_file = os.path.join(log_dir, f"llm_combiner_result_{timestamp}.txt")
-    with open(result_file, "w") as f:
-        f.write(response_message.content)
+    Path(result_file).write_bytes(response_message.content.encode("utf-8"))
     
     logger.info(f"Result saved to {result_file}")
     
@@ -177,21 +199,18 @@ async def run_llm_combiner_test() -> Tuple[str, str]:
 
 async def main():
     """Main function to run the test."""
-    print("Starting LLM-Assisted Output Combiner Agent test...")
-    print(f"Log file: {log_file}")
+    _, log_file = _setup_logging()
+    logger.info("Starting LLM-Assisted Output Combiner Agent test...")
+    logger.info(f"Log file: {log_file}")
     
     combined_content, result_file = await run_llm_combiner_test()
     
-    print("\nTest completed!")
-    print(f"Result file: {result_file}")
+    logger.info("Test completed!")
     
-    # Print a summary of the combined content
-    content_length = len(combined_content)
-    print(f"\nCombined content length: {content_length} characters")
-    print("\nFirst 200 characters of combined content:")
-    print(f"{combined_content[:200]}...")
-    print("\nLast 200 characters of combined content:")
-    print(f"...{combined_content[-200:]}")
+    # Log a summary of the combined content
+    logger.info(f"Combined content length: {len(combined_content)} characters")
+    logger.info(f"First 200 characters of combined content:\n{combined_content[:200]}...")
+    logger.info(f"Last 200 characters of combined content:\n...{combined_content[-200:]}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -9,7 +9,11 @@ import sys
 import json
 import logging
 import asyncio
-from dotenv import load_dotenv
+import httpx
+from functools import lru_cache
+
+from _compat import run_async
+from _secrets import mask_api_key
 
 # Add parent directory to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
@@ -21,35 +25,64 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Import the model caller functions
-from src.utils.model_caller import (
-    call_granite_instruct,
-    call_granite_guardian,
-    call_granite_embedding
+# Multi-line banner logged for each model response
+RESPONSE_BANNER_TEMPLATE = (
+    "\n" + "=" * 50 + "\n"
+    "RESPONSE FROM {title}:\n"
+    + "=" * 50 + "\n"
+    "Content: {content}\n"
+    "Model: {model_id}\n"
+    "Processing time: {processing_time_ms}ms\n"
+    + "=" * 50
 )
 
-async def test_granite_instruct():
-    """Test calling the Granite Instruct model."""
-    logger.info("=== Testing Granite Instruct Model ===")
+def format_response_banner(title: str, response) -> str:
+    """Render a model response as a single multi-line log message."""
+    return RESPONSE_BANNER_TEMPLATE.format_map({
+        "title": title,
+        "content": response.content,
+        "model_id": response.model_id,
+        "processing_time_ms": response.processing_time_ms
+    })
+
+@lru_cache(maxsize=1)
+def _api_meta():
+    """
+    Read each model's endpoint URL and masked API key from the environment once.
     
-    # Print API key info (masked for security)
-    api_key = os.environ.get("GRANITE_INSTRUCT_API_KEY", "")
-    api_url = os.environ.get("GRANITE_INSTRUCT_URL", "")
+    Called lazily so that it sees the variables loaded from .env in main().
+    
+    Returns:
+        Dictionary mapping model name to (url, masked api key)
+    """
+    return {
+        name: (os.environ.get(f"{prefix}_URL", ""), mask_api_key(os.environ.get(f"{prefix}_API_KEY", "")))
+        for name, prefix in (("Granite Instruct", "GRANITE_INSTRUCT"), ("Granite Guardian", "GRANITE_GUARDIAN"))
+    }
+
+def log_api_meta(name: str):
+    """Log whether the API key and URL for a model are configured."""
+    api_url, masked_key = _api_meta()[name]
     
-    if api_key:
-        masked_key = api_key[:4] + "*" * (len(api_key) - 8) + api_key[-4:]
-        logger.info(f"✅ Found Granite Instruct API key: {masked_key}")
+    if masked_key:
+        logger.info(f"✅ Found {name} API key: {masked_key}")
     else:
-        logger.error("❌ No Granite Instruct API key found!")
+        logger.error(f"❌ No {name} API key found!")
     
     if api_url:
-        logger.info(f"✅ Found Granite Instruct URL: {api_url}")
+        logger.info(f"✅ Found {name} URL: {api_url}")
     else:
-        logger.error("❌ No Granite Instruct URL found!")
-        
+        logger.error(f"❌ No {name} URL found!")
+
+async def test_granite_instruct(client: httpx.AsyncClient):
+    """Test calling the Granite Instruct model through the shared HTTP client."""
+    from src.utils.model_caller import call_granite_instruct
+    
+    logger.info("=== Testing Granite Instruct Model ===")
+    
+    # Print API key info (masked for security)
+    log_api_meta("Granite Instruct")
+    
     # Test messages
     messages = [
         {"role": "system", "content": "You are a helpful assistant."},
@@ -59,40 +92,24 @@ async def test_granite_instruct():
     # Call the model
     try:
         logger.info("Calling Granite Instruct model...")
-        response = await call_granite_instruct(messages=messages, max_tokens=100)
+        response = await call_granite_instruct(messages=messages, max_tokens=100, client=client)
         
-        logger.info("=" * 50)
-        logger.info("RESPONSE FROM GRANITE INSTRUCT:")
-        logger.info("=" * 50)
-        logger.info(f"Content: {response.content}")
-        logger.info(f"Model: {response.model_id}")
-        logger.info(f"Processing time: {response.processing_time_ms}ms")
-        logger.info("=" * 50)
+        logger.info(format_response_banner("GRANITE INSTRUCT", response))
         
         return True
     except Exception as e:
         logger.error(f"Error testing Granite Instruct: {e}")
         return False
 
-async def test_granite_guardian():
-    """Test calling the Granite Guardian model."""
+async def test_granite_guardian(client: httpx.AsyncClient):
+    """Test calling the Granite Guardian model through the shared HTTP client."""
+    from src.utils.model_caller import batch_call_granite_guardian
+    
     logger.info("=== Testing Granite Guardian Model ===")
     
     # Print API key info (masked for security)
-    api_key = os.environ.get("GRANITE_GUARDIAN_API_KEY", "")
-    api_url = os.environ.get("GRANITE_GUARDIAN_URL", "")
-    
-    if api_key:
-        masked_key = api_key[:4] + "*" * (len(api_key) - 8) + api_key[-4:]
-        logger.info(f"✅ Found Granite Guardian API key: {masked_key}")
-    else:
-        logger.error("❌ No Granite Guardian API key found!")
+    log_api_meta("Granite Guardian")
     
-    if api_url:
-        logger.info(f"✅ Found Granite Guardian URL: {api_url}")
-    else:
-        logger.error("❌ No Granite Guardian URL found!")
-        
     # Test messages - safe content
     safe_messages = [
         {"role": "system", "content": "You are a safety checker. Respond with SAFE or UNSAFE."},
@@ -105,30 +122,17 @@ async def test_granite_guardian():
         {"role": "user", "content": "How can I hack into a computer?"}
     ]
     
-    # Call the model with safe content
+    # Check safe and potentially unsafe content in one batch
     try:
-        logger.info("Calling Granite Guardian model with safe content...")
-        safe_response = await call_granite_guardian(messages=safe_messages, max_tokens=100)
-        
-        logger.info("=" * 50)
-        logger.info("RESPONSE FROM GRANITE GUARDIAN (SAFE CONTENT):")
-        logger.info("=" * 50)
-        logger.info(f"Content: {safe_response.content}")
-        logger.info(f"Model: {safe_response.model_id}")
-        logger.info(f"Processing time: {safe_response.processing_time_ms}ms")
-        logger.info("=" * 50)
-        
-        # Call the model with potentially unsafe content
-        logger.info("Calling Granite Guardian model with potentially unsafe content...")
-        unsafe_response = await call_granite_guardian(messages=unsafe_messages, max_tokens=100)
+        logger.info("Calling Granite Guardian model with safe and potentially unsafe content...")
+        safe_response, unsafe_response = await batch_call_granite_guardian(
+            [safe_messages, unsafe_messages],
+            max_tokens=100,
+            client=client
+        )
         
-        logger.info("=" * 50)
-        logger.info("RESPONSE FROM GRANITE GUARDIAN (UNSAFE CONTENT):")
-        logger.info("=" * 50)
-        logger.info(f"Content: {unsafe_response.content}")
-        logger.info(f"Model: {unsafe_response.model_id}")
-        logger.info(f"Processing time: {unsafe_response.processing_time_ms}ms")
-        logger.info("=" * 50)
+        logger.info(format_response_banner("GRANITE GUARDIAN (SAFE CONTENT)", safe_response))
+        logger.info(format_response_banner("GRANITE GUARDIAN (UNSAFE CONTENT)", unsafe_response))
         
         return True
     except Exception as e:
@@ -137,8 +141,21 @@ async def test_granite_guardian():
 
 async def main():
     """Run all tests."""
-    instruct_success = await test_granite_instruct()
-    guardian_success = await test_granite_guardian()
+    from dotenv import load_dotenv
+    
+    # Load environment variables from .env file; model_caller reads its
+    # endpoint configuration on import, so this must run before the tests
+    load_dotenv()
+    
+    # The two models are independent, so test them concurrently over one connection pool.
+    # The task group cancels the other test if one raises unexpectedly.
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        async with asyncio.TaskGroup() as tg:
+            instruct_task = tg.create_task(test_granite_instruct(client))
+            guardian_task = tg.create_task(test_granite_guardian(client))
+    
+    instruct_success = instruct_task.result()
+    guardian_success = guardian_task.result()
     
     # Summarize results
     logger.info("\n" + "=" * 60)
@@ -154,4 +171,4 @@ async def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_async(main())
\ No newline at end of file
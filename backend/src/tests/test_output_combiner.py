@@ -6,78 +6,107 @@ and logs all outputs to a file for review.
 """
 import os
 import sys
-import json
-import asyncio
 import logging
 import time
 from datetime import datetime
-from dotenv import load_dotenv
+from pathlib import Path
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from _compat import run_async, dumps_compact, dumps_pretty
 
 # Set up proper import path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-# Import core components
-from src.agent_system.core.message import Message, MessageRole
-from src.agent_system.core.workflow_manager import WorkflowManager
-from src.registries.agent_registry import AgentRegistry
-
-# Load environment variables
-load_dotenv()
+# The workflow components pull in the whole agent system, so they're imported
+# lazily once the test actually runs
+if TYPE_CHECKING:
+    from src.agent_system.core.workflow_manager import WorkflowManager
 
-# Configure logging
+# Directory for test logs and results
 log_dir = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')), "logs")
-os.makedirs(log_dir, exist_ok=True)
-
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_file = os.path.join(log_dir, f"combiner_test_{timestamp}.log")
-
-# Set up file handler
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-
-# Set up console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter('%(name)s - %(levelname)s - %(message)s'))
-
-# Configure root logger
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.DEBUG)
-root_logger.addHandler(file_handler)
-root_logger.addHandler(console_handler)
 
 # Set up specific logger for this test
 logger = logging.getLogger("output_combiner_test")
 
+@lru_cache(maxsize=1)
+def _setup_logging():
+    """
+    Create the log directory and attach file and console handlers to the root logger.
+    
+    Runs once, when the test starts rather than at import time.
+    
+    Returns:
+        Tuple of (run timestamp, log file path)
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = os.path.join(log_dir, f"combiner_test_{timestamp}.log")
+    
+    # Set up file handler
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    # Set up console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter('%(name)s - %(levelname)s - %(message)s'))
+    
+    # Configure root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(file_handler)
+    root_logger.addHandler(console_handler)
+    
+    return timestamp, log_file
+
+@lru_cache(maxsize=None)
+def _workflow_manager(registry_dir: str) -> "WorkflowManager":
+    """Create the agent registry and workflow manager once per registry directory."""
+    from src.agent_system.core.workflow_manager import WorkflowManager
+    from src.registries.agent_registry import AgentRegistry
+    
+    return WorkflowManager(registry_dir=registry_dir, agent_registry=AgentRegistry())
+
 class TestCallback:
     """Callback class for handling workflow step events"""
     
-    def __init__(self):
+    def __init__(self, events_file: Path):
         self.callbacks = {}
-        self.events = []
+        self.events_file = events_file
+        # Events are streamed to a JSONL file as they arrive instead of held in memory.
+        # Their timestamps are Unix epoch seconds, which are much cheaper than ISO strings.
+        self._events_fp = open(events_file, 'w', buffering=1)
         self.agent_outputs = {}
     
+    def _record_event(self, event: dict):
+        """Append a single event to the JSONL events file."""
+        self._events_fp.write(dumps_compact(event) + "\n")
+    
     def visualization_callback(self, agent_id: str):
         """Track agent visualization events."""
-        logger.info(f"Visualization event from agent: {agent_id}")
-        self.events.append({
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"Visualization event from agent: {agent_id}")
+        self._record_event({
             "type": "visualization",
             "agent_id": agent_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time()
         })
         return None
     
     def log_callback(self, agent_id: str, input_text: str, output_text: str, processing_time: int):
         """Track agent log events."""
-        logger.info(f"Log event from agent: {agent_id} (processing time: {processing_time}ms)")
-        self.events.append({
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"Log event from agent: {agent_id} (processing time: {processing_time}ms)")
+        self._record_event({
             "type": "log",
             "agent_id": agent_id,
             "input_length": len(input_text) if input_text else 0,
             "output_length": len(output_text) if output_text else 0,
             "processing_time": processing_time,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time()
         })
         
         # Store the agent output for later analysis
@@ -90,13 +119,14 @@ class TestCallback:
     
     def stream_callback(self, agent_id: str, message_type: str, content: str, data: dict):
         """Track agent streaming events."""
-        logger.info(f"Stream event from agent: {agent_id} (type: {message_type})")
-        self.events.append({
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"Stream event from agent: {agent_id} (type: {message_type})")
+        self._record_event({
             "type": "stream",
             "agent_id": agent_id,
             "message_type": message_type,
             "content_length": len(content) if content else 0,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time()
         })
         return None
     
@@ -108,22 +138,23 @@ class TestCallback:
             "stream": self.stream_callback
         }
     
-    def save_events(self, output_file):
-        """Save all recorded events to a file."""
-        with open(output_file, 'w') as f:
-            json.dump(self.events, f, indent=2)
+    def save_events(self, agent_outputs_file: Path):
+        """Finish the events file and save the agent outputs to agent_outputs_file."""
+        self._events_fp.close()
         
         # Also save agent outputs
-        agent_outputs_file = output_file.replace("events_", "agent_outputs_")
-        with open(agent_outputs_file, 'w') as f:
-            json.dump(self.agent_outputs, f, indent=2, default=str)
-        
-        return output_file, agent_outputs_file
+        agent_outputs_file.write_text(dumps_pretty(self.agent_outputs))
 
 async def test_workflow():
     """
     Run the Graph RAG Workflow with the test prompt and log all outputs.
     """
+    from dotenv import load_dotenv
+    
+    # Load environment variables before any agent reads its configuration
+    load_dotenv()
+    
+    timestamp, log_file = _setup_logging()
     logger.info("Starting workflow test")
     
     # Test prompt
@@ -131,38 +162,36 @@ async def test_workflow():
     
     logger.info(f"Test prompt: {test_prompt}")
     
-    # Create workflow manager and registry
-    agent_registry = AgentRegistry()
-    
-    # Get workflow registry directory
+    # Get the (cached) workflow manager for the workflow registry directory
     current_dir = os.path.dirname(os.path.abspath(__file__))
     registry_dir = os.path.join(os.path.dirname(current_dir), "registries", "workflows")
+    workflow_manager = _workflow_manager(registry_dir)
     
-    # Create workflow manager
-    workflow_manager = WorkflowManager(registry_dir=registry_dir, agent_registry=agent_registry)
-    
-    # Create callback handler
-    callback_handler = TestCallback()
+    # Create callback handler, which writes events as they happen
+    events_file = Path(log_dir) / f"events_{timestamp}.jsonl"
+    agent_outputs_file = Path(log_dir) / f"agent_outputs_{timestamp}.json"
+    callback_handler = TestCallback(events_file)
     
     # Process the message
     logger.info(f"Processing message with workflow GRAPH_RAG_WORKFLOW")
     start_time = time.time()
     
     # Set workflow_id in metadata to ensure GRAPH_RAG_WORKFLOW is used
-    result = await workflow_manager.process_message(
-        message_content=test_prompt,
-        user_id="test_user",
-        callbacks=callback_handler.get_callbacks(),
-        workflow_id="GRAPH_RAG_WORKFLOW"  # Explicitly specify which workflow to use
-    )
+    try:
+        result = await workflow_manager.process_message(
+            message_content=test_prompt,
+            user_id="test_user",
+            callbacks=callback_handler.get_callbacks(),
+            workflow_id="GRAPH_RAG_WORKFLOW"  # Explicitly specify which workflow to use
+        )
+    finally:
+        # Close the events file and save agent outputs even if the workflow fails
+        callback_handler.save_events(agent_outputs_file)
     
     end_time = time.time()
     processing_time = round((end_time - start_time) * 1000)
     logger.info(f"Processing completed in {processing_time}ms")
     
-    # Save events to a file
-    events_file = os.path.join(log_dir, f"events_{timestamp}.json")
-    events_file, agent_outputs_file = callback_handler.save_events(events_file)
     logger.info(f"Saved event log to {events_file}")
     logger.info(f"Saved agent outputs to {agent_outputs_file}")
     
@@ -173,8 +202,7 @@ async def test_workflow():
         
         # Save result content to a separate file for easy review
         content_file = os.path.join(log_dir, f"result_{timestamp}.md")
-        with open(content_file, 'w') as f:
-            f.write(result)
+        Path(content_file).write_bytes(result.encode("utf-8"))
         logger.info(f"Result content saved to: {content_file}")
     else:
         logger.error("No result returned from workflow execution")
@@ -183,14 +211,16 @@ async def test_workflow():
     return result
 
 if __name__ == "__main__":
+    timestamp, log_file = _setup_logging()
     try:
-        print(f"Starting test with prompt about travel to Saudi Arabia...")
-        print(f"Logs will be saved to: {log_file}")
-        result = asyncio.run(test_workflow())
-        print("\nTest completed. Check these files for details:")
-        print(f"- Log file: {log_file}")
-        print(f"- Result content: {os.path.join(log_dir, f'result_{timestamp}.md')}")
-        print(f"- Events: {os.path.join(log_dir, f'events_{timestamp}.json')}")
+        logger.info("Starting test with prompt about travel to Saudi Arabia...")
+        logger.info(f"Logs will be saved to: {log_file}")
+        result = run_async(test_workflow())
+        logger.info(
+            "Test completed. Check these files for details:\n"
+            f"- Log file: {log_file}\n"
+            f"- Result content: {os.path.join(log_dir, f'result_{timestamp}.md')}\n"
+            f"- Events: {os.path.join(log_dir, f'events_{timestamp}.jsonl')}"
+        )
     except Exception as e:
-        logger.exception(f"Error running test: {e}")
-        print(f"\nTest failed with error: {e}")
+        logger.exception(f"Test failed with error: {e}")
@@ -11,9 +11,15 @@ import json
 import logging
 import asyncio
 import time
+import hashlib
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, TextIO
 from datetime import datetime
+from functools import lru_cache
+from collections import defaultdict
+from jinja2 import Environment, FileSystemLoader, Template
+
+from _compat import dumps_compact, load_json_file
 
 # Add the project root to the Python path
 project_root = Path(__file__).parents[2]
@@ -31,9 +37,10 @@ os.makedirs(output_dir, exist_ok=True)
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 log_file = output_dir / f"test_output_combiner_{timestamp}.log"
 
-# Set up file handler
+# Set up file and console handlers; INFO keeps per-record handler cost down since
+# every record is written to both
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler(log_file),
@@ -42,6 +49,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("output_combiner_test")
 
+# Number of events buffered in memory before they're appended to the events file
+EVENT_FLUSH_SIZE = 50
+
+# Size of the buffered thinking text per agent at which it's written to its file
+THINKING_FLUSH_SIZE = 64 * 1024
+
 # Test query focused on a scenario that will activate visualization
 TEST_QUERY = "I have a patient living in New York who plans travel to Zimbabwe in September of this year. This patient has had dengue fever in the last 3 years. What advice should I give him regarding his trip?"
 
@@ -51,71 +64,145 @@ class TestCallbacks:
     def __init__(self, output_dir: Path, test_name: str):
         self.output_dir = output_dir
         self.test_name = test_name
-        self.events = []
+        # Events are buffered and appended to a JSONL file in batches, so they're
+        # persisted incrementally instead of serialized all at once at the end
+        self.events_file = output_dir / f"{test_name}_events_{timestamp}.jsonl"
+        self._events_fp = open(self.events_file, 'w', buffering=1 << 20)
+        self._events_buf: List[dict] = []
         self.agent_outputs = {}
         self.start_time = time.time()
         self.most_recent_response = None
         self.test_logger = logger
+        # Per-agent output file names are built from this prefix and suffix
+        self._prefix = str(output_dir / f"{test_name}_")
+        self._suffix = f"_{timestamp}.txt"
+        # Per-agent output files stay open for the whole run, keyed by (agent_id, kind)
+        self._fh: Dict[Tuple[str, str], TextIO] = {}
+        # Thinking chunks are buffered per agent and written in batches
+        self._thinking_bufs: Dict[str, List[str]] = defaultdict(list)
+        self._thinking_sizes: Dict[str, int] = defaultdict(int)
+        # Agent inputs/outputs already written, so repeated log events aren't rewritten
+        self._seen = set()
+    
+    def _output_path(self, agent_id: str, kind: str) -> str:
+        """Path of the per-agent output file for the given kind ("io" or "thinking")."""
+        if kind == "thinking":
+            return self._prefix + agent_id + "_thinking" + self._suffix
+        return self._prefix + agent_id + self._suffix
+    
+    def _get_handle(self, agent_id: str, kind: str) -> TextIO:
+        """Open the per-agent output file on first use and reuse it afterwards."""
+        key = (agent_id, kind)
+        fh = self._fh.get(key)
+        if fh is None:
+            mode = 'a' if kind == "thinking" else 'w'
+            fh = self._fh[key] = open(self._output_path(agent_id, kind), mode, buffering=1 << 16)
+        return fh
+    
+    def _stamp(self) -> Tuple[str, int]:
+        """Return the ISO timestamp and elapsed milliseconds from a single clock read."""
+        now = time.time()
+        return datetime.fromtimestamp(now).isoformat(), round((now - self.start_time) * 1000)
+    
+    def _record_event(self, event: dict):
+        """Buffer an event, flushing the buffer once it reaches EVENT_FLUSH_SIZE."""
+        self._events_buf.append(event)
+        if len(self._events_buf) >= EVENT_FLUSH_SIZE:
+            self._flush_events()
+    
+    def _flush_events(self):
+        """Append the buffered events to the events file as JSON lines."""
+        if self._events_buf:
+            self._events_fp.write("\n".join(dumps_compact(e) for e in self._events_buf) + "\n")
+            self._events_buf.clear()
+    
+    def _flush_thinking(self, agent_id: str):
+        """Write an agent's buffered thinking chunks to its thinking file."""
+        buf = self._thinking_bufs.pop(agent_id, None)
+        self._thinking_sizes.pop(agent_id, None)
+        if buf:
+            self._get_handle(agent_id, "thinking").write("".join(buf))
+    
+    def close(self):
+        """Write any buffered thinking and close all per-agent output files."""
+        for agent_id in list(self._thinking_bufs):
+            self._flush_thinking(agent_id)
+        for fh in self._fh.values():
+            fh.close()
+        self._fh.clear()
         
     def visualization_callback(self, agent_id: str):
         """Track agent visualization events."""
-        logger.info(f"Visualization event from agent: {agent_id}")
-        self.events.append({
+        logger.info("Visualization event from agent: %s", agent_id)
+        ts, elapsed_ms = self._stamp()
+        self._record_event({
             "type": "visualization",
             "agent_id": agent_id,
-            "timestamp": datetime.now().isoformat(),
-            "elapsed_ms": round((time.time() - self.start_time) * 1000)
+            "timestamp": ts,
+            "elapsed_ms": elapsed_ms
         })
         return None
     
     def log_callback(self, agent_id: str, input_text: str, output_text: str, processing_time: int):
         """Track agent log events."""
-        logger.info(f"Log event from agent: {agent_id} (processing time: {processing_time}ms)")
+        logger.info("Log event from agent: %s (processing time: %sms)", agent_id, processing_time)
+        ts, elapsed_ms = self._stamp()
+        
+        input_length = len(input_text) if input_text else 0
+        output_length = len(output_text) if output_text else 0
+        agent_output_file = self._output_path(agent_id, "io")
         
-        # Store the agent output for later analysis
+        # Store a summary of the agent output for later analysis; the full text
+        # only lives in the per-agent output file
         self.agent_outputs[agent_id] = {
-            "input": input_text,
-            "output": output_text,
+            "input_length": input_length,
+            "output_length": output_length,
+            "output_sha1": hashlib.sha1((output_text or "").encode()).hexdigest()[:12],
+            "output_file": agent_output_file,
             "processing_time": processing_time,
-            "timestamp": datetime.now().isoformat(),
-            "elapsed_ms": round((time.time() - self.start_time) * 1000)
+            "timestamp": ts,
+            "elapsed_ms": elapsed_ms
         }
         
         # Save full agent output to separate file for detailed analysis
-        agent_output_file = self.output_dir / f"{self.test_name}_{agent_id}_{timestamp}.txt"
-        with open(agent_output_file, 'w') as f:
-            f.write(f"=== INPUT ===\n\n{input_text}\n\n=== OUTPUT ===\n\n{output_text}")
+        entry_key = (agent_id, hash((input_text, output_text)))
+        if entry_key not in self._seen:
+            self._seen.add(entry_key)
+            self._get_handle(agent_id, "io").write(f"=== INPUT ===\n\n{input_text}\n\n=== OUTPUT ===\n\n{output_text}\n\n")
         
         # Record event
-        self.events.append({
+        self._record_event({
             "type": "log",
             "agent_id": agent_id,
-            "input_length": len(input_text) if input_text else 0,
-            "output_length": len(output_text) if output_text else 0,
+            "input_length": input_length,
+            "output_length": output_length,
             "processing_time": processing_time,
-            "output_file": str(agent_output_file),
-            "timestamp": datetime.now().isoformat(),
-            "elapsed_ms": round((time.time() - self.start_time) * 1000)
+            "output_file": agent_output_file,
+            "timestamp": ts,
+            "elapsed_ms": elapsed_ms
         })
         return None
     
     def stream_callback(self, agent_id: str, message_type: str, content: str, data: Any):
         """Track agent streaming events."""
-        logger.info(f"Stream event from agent: {agent_id} (type: {message_type})")
-        self.events.append({
+        logger.info("Stream event from agent: %s (type: %s)", agent_id, message_type)
+        ts, elapsed_ms = self._stamp()
+        self._record_event({
             "type": "stream",
             "agent_id": agent_id,
             "message_type": message_type,
             "content_length": len(content) if content else 0,
-            "timestamp": datetime.now().isoformat(),
-            "elapsed_ms": round((time.time() - self.start_time) * 1000)
+            "timestamp": ts,
+            "elapsed_ms": elapsed_ms
         })
         
         # If this is a "thinking" event, save it separately
         if message_type == "thinking" and content:
-            thinking_file = self.output_dir / f"{self.test_name}_{agent_id}_thinking_{timestamp}.txt"
-            with open(thinking_file, 'a') as f:
-                f.write(f"{content}\n\n")
+            chunk = f"{content}\n\n"
+            self._thinking_bufs[agent_id].append(chunk)
+            self._thinking_sizes[agent_id] += len(chunk)
+            if self._thinking_sizes[agent_id] >= THINKING_FLUSH_SIZE:
+                self._flush_thinking(agent_id)
                 
         return None
     
@@ -129,58 +216,60 @@ class TestCallbacks:
             next_step: Next step name
             data: Data passed to the callback
         """
-        self.test_logger.info(f"Workflow step: {current_step} -> {next_step}")
-        self.events.append({
+        self.test_logger.info("Workflow step: %s -> %s", current_step, next_step)
+        ts, elapsed_ms = self._stamp()
+        self._record_event({
             "type": "workflow_step",
             "workflow_id": workflow_id,
             "current_step": current_step,
             "next_step": next_step,
-            "timestamp": datetime.now().isoformat(),
-            "elapsed_ms": round((time.time() - self.start_time) * 1000)
+            "timestamp": ts,
+            "elapsed_ms": elapsed_ms
         })
         
+        if not data:
+            return data
+        
+        # Read the message fields once; not every step passes a full Message
+        content = getattr(data, "content", None)
+        metadata = getattr(data, "metadata", None) or {}
+        
         # Identify when the response_generator_agent has completed and save its output
-        if current_step == "response_generator_agent" and data:
+        if current_step == "response_generator_agent":
             # Store the response generator output for later use
-            self.most_recent_response = data.content
-            self.test_logger.info(f"Stored response generator output: {len(self.most_recent_response)} chars")
+            self.most_recent_response = content
+            self.test_logger.info("Stored response generator output: %d chars", len(content))
             
             # Also store it in the agent_outputs directly for easier debugging
-            if hasattr(self, "agent_outputs") and "response_generator_agent" in self.agent_outputs:
+            if "response_generator_agent" in self.agent_outputs:
                 self.test_logger.info("Updating agent_outputs with response generator content")
         
         # Before running the output combiner agent, we need to ensure it has access to 
         # the response generator agent's output
-        if next_step == "rag_output_combiner_agent" and data:
+        if next_step == "rag_output_combiner_agent":
             # Log what we're doing
             self.test_logger.info("Preparing message for output combiner agent")
             
-            if hasattr(self, "most_recent_response") and self.most_recent_response:
+            if self.most_recent_response:
                 # Log the stored response
-                self.test_logger.info(f"Using stored response from generator: {len(self.most_recent_response)} chars")
-                
-                # Create a new complete metadata dictionary
-                new_metadata = {}
-                
-                # Copy original metadata if available
-                if hasattr(data, "metadata") and data.metadata:
-                    new_metadata = data.metadata.copy()
-                
-                # Ensure we have the original query
-                if "original_query" not in new_metadata and hasattr(data, "content"):
-                    new_metadata["original_query"] = data.content
+                self.test_logger.info("Using stored response from generator: %d chars", len(self.most_recent_response))
                 
-                # Add the stored response directly
-                new_metadata["response_generator_output"] = self.most_recent_response
+                # Build the complete metadata in one pass: the original metadata, the
+                # original query if it's missing, and the stored response
+                new_metadata = {
+                    **metadata,
+                    "original_query": metadata.get("original_query", content),
+                    "response_generator_output": self.most_recent_response
+                }
                 
                 # Create a new message with proper metadata
                 new_message = Message(
                     role=MessageRole.USER,
-                    content=data.content if hasattr(data, "content") and data.content else self.most_recent_response,
+                    content=content or self.most_recent_response,
                     metadata=new_metadata
                 )
                 
-                self.test_logger.info(f"Created new message for output combiner with metadata keys: {list(new_metadata.keys())}")
+                self.test_logger.info("Created new message for output combiner with metadata keys: %s", list(new_metadata))
                 
                 # Return the new message to replace the original
                 return new_message
@@ -200,10 +289,13 @@ class TestCallbacks:
     
     def save_results(self):
         """Save all test results to files."""
-        # Save events
-        events_file = self.output_dir / f"{self.test_name}_events_{timestamp}.json"
-        with open(events_file, 'w') as f:
-            json.dump(self.events, f, indent=2)
+        # Flush and close the per-agent output files
+        self.close()
+        
+        # Write any remaining events and close the events file
+        self._flush_events()
+        self._events_fp.close()
+        events_file = self.events_file
         
         # Save agent outputs summary
         outputs_file = self.output_dir / f"{self.test_name}_outputs_{timestamp}.json"
@@ -215,6 +307,76 @@ class TestCallbacks:
         
         return events_file, outputs_file
 
+def build_report_context(response_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize a combined response into the context for the dengue report template.
+    
+    The countries may be under data.countries, data.countries_data, or the same keys
+    nested one level deeper under data.data; whichever is found first is used.
+    
+    Args:
+        response_json: Parsed JSON response from the output combiner
+        
+    Returns:
+        Template context for dengue_report.md.j2
+    """
+    # Only show the response text if it's actual prose rather than a routing label or JSON
+    response_text = response_json.get("response")
+    if isinstance(response_text, dict):
+        response_text = json.dumps(response_text, indent=2)
+    elif not isinstance(response_text, str) or response_text == "graph_rag" or response_text.strip().startswith("{"):
+        response_text = None
+    
+    data = response_json["data"] if "data" in response_json else None
+    countries = []
+    data_keys = None
+    summary_countries = []
+    analysis = None
+    
+    if data is not None:
+        for container in (data, data.get("data", {})):
+            if "countries" in container:
+                countries = container["countries"]
+                break
+            if "countries_data" in container:
+                countries = container["countries_data"]
+                break
+        
+        # Without country data, fall back to listing what the data does contain
+        if not countries:
+            data_keys = list(data.keys())
+            summary_countries = data.get("countries_data", [])
+        
+        analysis = data.get("analysis")
+    
+    return {
+        "response_text": response_text,
+        "countries": countries,
+        "data_keys": data_keys,
+        "summary_countries": summary_countries,
+        "analysis": analysis,
+        "citations": response_json.get("citations") or [],
+        "generated_on": response_json.get("timestamp", "N/A"),
+        "version": response_json.get("version", "N/A"),
+        "response_type": response_json.get("type", "N/A")
+    }
+
+@lru_cache(maxsize=1)
+def _report_template() -> Template:
+    """Load and compile the dengue report template once."""
+    env = Environment(
+        loader=FileSystemLoader(Path(__file__).parent / "templates"),
+        autoescape=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True
+    )
+    return env.get_template("dengue_report.md.j2")
+
+def render_report(context: Dict[str, Any]) -> str:
+    """Render the dengue report markdown from a build_report_context() context."""
+    return _report_template().render(**context)
+
 async def check_agent_registry(agent_id: str):
     """
     Check if an agent exists in the registry.
@@ -225,10 +387,13 @@ async def check_agent_registry(agent_id: str):
     Returns:
         bool: Whether the agent exists in the registry
     """
-    agent_registry = AgentRegistry()
+    def lookup():
+        return AgentRegistry().get_agent_config(agent_id)
+    
     try:
-        # Try to get the agent config
-        agent_config = agent_registry.get_agent_config(agent_id)
+        # Load the registry and get the agent config in a thread; both read files
+        # synchronously, and this lets the workflow file check run alongside
+        agent_config = await asyncio.to_thread(lookup)
         logger.info(f"Agent '{agent_id}' found in registry with config: {agent_config.get('type', 'unknown')}")
         return True
     except ValueError:
@@ -248,8 +413,8 @@ async def check_workflow_agent_steps():
         logger.error(f"Workflow file not found: {workflow_file}")
         return False, []
     
-    with open(workflow_file, 'r') as f:
-        workflow = json.load(f)
+    # Read the workflow in a thread so it doesn't block the concurrent registry check
+    workflow = await asyncio.to_thread(load_json_file, workflow_file)
         
     steps = workflow.get("steps", [])
     
@@ -268,14 +433,15 @@ async def run_test():
     """Run the comprehensive test for the output combiner agent"""
     logger.info("Starting RAG Output Combiner Agent comprehensive test")
     
-    # Check if agent is registered
-    registered = await check_agent_registry("rag_output_combiner_agent")
+    # Check that the agent is registered and in the workflow steps; the checks are independent
+    registered, (in_workflow, _) = await asyncio.gather(
+        check_agent_registry("rag_output_combiner_agent"),
+        check_workflow_agent_steps()
+    )
     if not registered:
         logger.error("Cannot proceed without rag_output_combiner_agent registered")
         return None
     
-    # Check if agent is in workflow steps
-    in_workflow, _ = await check_workflow_agent_steps()
     if not in_workflow:
         logger.error("Cannot proceed without rag_output_combiner_agent in workflow steps")
         return None
@@ -326,6 +492,8 @@ async def run_test():
             "success": True,
             "execution_time_ms": execution_time,
             "result_file": str(result_file),
+            # Already-parsed result, so callers needn't re-read the result file
+            "result_data": result if isinstance(result, dict) else None,
             "events_file": str(events_file),
             "outputs_file": str(outputs_file)
         }
@@ -359,9 +527,10 @@ if __name__ == "__main__":
                 result_file = results['result_file']
                 print(f"\nAnalyzing result file: {result_file}")
                 
-                # Parse the JSON output
-                with open(result_file, 'r') as f:
-                    result_data = json.load(f)
+                # Use the result in memory, only parsing the JSON output if it was a string
+                result_data = results.get("result_data")
+                if result_data is None:
+                    result_data = load_json_file(result_file)
                 
                 # Check if there's a response field and extract it
                 if "response" in result_data:
@@ -374,210 +543,8 @@ if __name__ == "__main__":
                                 response_json = json.loads(response_content)
                                 print(f"\nResponse is a JSON string with keys: {list(response_json.keys())}")
                                 
-                                # Create a formatted markdown document
-                                markdown_content = ["# Dengue Data Analysis Report\n\n"]
-                                
-                                # Add actual response text if available (putting this first as the main content)
-                                if "response" in response_json and response_json["response"]:
-                                    response_text = response_json["response"]
-                                    if response_text and response_text != "graph_rag" and not response_text.strip().startswith("{"):
-                                        markdown_content.append(f"{response_text}\n\n")
-                                    elif isinstance(response_text, dict):
-                                        markdown_content.append(json.dumps(response_text, indent=2))
-                                        markdown_content.append("\n\n")
-                                
-                                # Add visualization section
-                                markdown_content.append("## Dengue Fever Visualization Data\n\n")
-                                
-                                # Add countries data if available
-                                if "data" in response_json:
-                                    # First check direct data structures
-                                    countries_data = []
-                                    
-                                    # Check for direct countries key
-                                    if "countries" in response_json["data"]:
-                                        countries_data = response_json["data"]["countries"]
-                                    # Check for countries_data array
-                                    elif "countries_data" in response_json["data"]:
-                                        countries_data = response_json["data"]["countries_data"]
-                                    # Check for nested structure in data.data
-                                    elif "data" in response_json["data"]:
-                                        if "countries" in response_json["data"]["data"]:
-                                            countries_data = response_json["data"]["data"]["countries"]
-                                        elif "countries_data" in response_json["data"]["data"]:
-                                            countries_data = response_json["data"]["data"]["countries_data"]
-                                    
-                                    if countries_data:
-                                        for country_data in countries_data:
-                                            # Add country header
-                                            country_name = country_data.get("country", "Unknown Country")
-                                            markdown_content.append(f"### {country_name}\n\n")
-                                            
-                                            # Add current date and presentation date
-                                            current_date = country_data.get("current_date", "N/A")
-                                            presentation_date = country_data.get("presentation_date", "N/A")
-                                            markdown_content.append(f"- **Current Date:** {current_date}\n")
-                                            markdown_content.append(f"- **Prediction Target Date:** {presentation_date}\n\n")
-                                            
-                                            # Check for time_series data or historical_data + predicted_data
-                                            if "time_series" in country_data:
-                                                time_series = country_data["time_series"]
-                                                markdown_content.append("#### Time Series Data\n\n")
-                                                markdown_content.append("| Date | Cases | Type |\n")
-                                                markdown_content.append("|------|-------|------|\n")
-                                                
-                                                for entry in time_series:
-                                                    date = entry.get("date", "N/A")
-                                                    cases = entry.get("cases", "N/A")
-                                                    data_type = entry.get("type", "historical")
-                                                    markdown_content.append(f"| {date} | {cases} | {data_type} |\n")
-                                                
-                                                markdown_content.append("\n")
-                                            # Handle separate historical and predicted data
-                                            elif "historical_data" in country_data or "predicted_data" in country_data:
-                                                markdown_content.append("#### Historical & Predicted Data\n\n")
-                                                markdown_content.append("| Date | Dengue Cases | Temperature | Humidity | Type |\n")
-                                                markdown_content.append("|------|--------------|------------|----------|------|\n")
-                                                
-                                                # Add historical data
-                                                if "historical_data" in country_data:
-                                                    historical = country_data["historical_data"]
-                                                    # Only show the last 12 entries to keep it manageable
-                                                    display_count = min(12, len(historical))
-                                                    for entry in historical[-display_count:]:
-                                                        date = entry.get("calendar_start_date", "N/A")
-                                                        cases = entry.get("dengue_total", "N/A")
-                                                        temp = entry.get("avg_temperature", "N/A")
-                                                        humidity = entry.get("avg_humidity", "N/A")
-                                                        markdown_content.append(f"| {date} | {cases} | {temp}°C | {humidity}% | historical |\n")
-                                                
-                                                # Add predicted data
-                                                if "predicted_data" in country_data:
-                                                    predicted = country_data["predicted_data"]
-                                                    for entry in predicted:
-                                                        date = entry.get("calendar_start_date", "N/A")
-                                                        cases = entry.get("dengue_total", "N/A")
-                                                        temp = entry.get("avg_temperature", "N/A") 
-                                                        humidity = entry.get("avg_humidity", "N/A")
-                                                        markdown_content.append(f"| {date} | {cases} | {temp}°C | {humidity}% | **predicted** |\n")
-                                                
-                                                markdown_content.append("\n")
-                                    else:
-                                        # Log detailed structure for debugging
-                                        data_keys = list(response_json["data"].keys())
-                                        markdown_content.append(f"Available data keys: {data_keys}\n\n")
-                                        
-                                        # Create a simplified view of the data instead of raw JSON
-                                        if "countries_data" in response_json["data"]:
-                                            countries_data = response_json["data"]["countries_data"]
-                                            for country_data in countries_data:
-                                                country_name = country_data.get("country", "Unknown Country")
-                                                markdown_content.append(f"### {country_name}\n\n")
-                                                
-                                                current_date = country_data.get("current_date", "N/A")
-                                                presentation_date = country_data.get("presentation_date", "N/A")
-                                                markdown_content.append(f"- **Current Date:** {current_date}\n")
-                                                markdown_content.append(f"- **Prediction Target Date:** {presentation_date}\n\n")
-                                                
-                                                # Simplified stats summary instead of all data points
-                                                historical_count = len(country_data.get("historical_data", []))
-                                                predicted_count = len(country_data.get("predicted_data", []))
-                                                
-                                                markdown_content.append("#### Data Summary\n\n")
-                                                markdown_content.append(f"- Historical data points: {historical_count}\n")
-                                                markdown_content.append(f"- Predicted data points: {predicted_count}\n\n")
-                                                
-                                                # Show last 6 months of historical data in a table
-                                                if historical_count > 0:
-                                                    markdown_content.append("#### Recent Historical Data (Last 6 Months)\n\n")
-                                                    markdown_content.append("| Date | Dengue Cases | Temperature | Humidity |\n")
-                                                    markdown_content.append("|------|--------------|------------|----------|\n")
-                                                    
-                                                    historical = country_data["historical_data"]
-                                                    display_count = min(6, historical_count)
-                                                    for entry in historical[-display_count:]:
-                                                        date = entry.get("calendar_start_date", "N/A")
-                                                        cases = entry.get("dengue_total", "N/A")
-                                                        temp = entry.get("avg_temperature", "N/A")
-                                                        humidity = entry.get("avg_humidity", "N/A")
-                                                        markdown_content.append(f"| {date} | {cases} | {temp}°C | {humidity}% |\n")
-                                                    
-                                                    markdown_content.append("\n")
-                                                
-                                                # Show predicted data in a table
-                                                if predicted_count > 0:
-                                                    markdown_content.append("#### Predicted Data\n\n")
-                                                    markdown_content.append("| Date | Dengue Cases | Temperature | Humidity |\n")
-                                                    markdown_content.append("|------|--------------|------------|----------|\n")
-                                                    
-                                                    predicted = country_data["predicted_data"]
-                                                    for entry in predicted:
-                                                        date = entry.get("calendar_start_date", "N/A")
-                                                        cases = entry.get("dengue_total", "N/A")
-                                                        temp = entry.get("avg_temperature", "N/A")
-                                                        humidity = entry.get("avg_humidity", "N/A")
-                                                        markdown_content.append(f"| {date} | {cases} | {temp}°C | {humidity}% |\n")
-                                                    
-                                                    markdown_content.append("\n")
-                                
-                                # Add analysis section if present
-                                if "data" in response_json and "analysis" in response_json["data"]:
-                                    analysis = response_json["data"]["analysis"]
-                                    markdown_content.append("## Analysis\n\n")
-                                    
-                                    # Add trend analysis
-                                    if "trend" in analysis:
-                                        trend = analysis["trend"]
-                                        markdown_content.append("### Trend Analysis\n\n")
-                                        markdown_content.append(f"{trend}\n\n")
-                                    
-                                    # Add insights
-                                    if "insights" in analysis and analysis["insights"]:
-                                        markdown_content.append("### Key Insights\n\n")
-                                        for insight in analysis["insights"]:
-                                            markdown_content.append(f"- {insight}\n")
-                                        markdown_content.append("\n")
-                                    
-                                    # Add recommendations
-                                    if "recommendations" in analysis and analysis["recommendations"]:
-                                        markdown_content.append("### Recommendations\n\n")
-                                        for rec in analysis["recommendations"]:
-                                            markdown_content.append(f"- {rec}\n")
-                                        markdown_content.append("\n")
-                                    
-                                    # Add summaries
-                                    if "summaries" in analysis and analysis["summaries"]:
-                                        markdown_content.append("### Country Summaries\n\n")
-                                        for summary in analysis["summaries"]:
-                                            if "country" in summary and "summary" in summary:
-                                                markdown_content.append(f"#### {summary['country']}\n\n")
-                                                markdown_content.append(f"{summary['summary']}\n\n")
-                                
-                                # Add citations if present
-                                if "citations" in response_json:
-                                    citations = response_json.get("citations", [])
-                                    if citations:
-                                        markdown_content.append("## Citations\n\n")
-                                        for i, citation in enumerate(citations, 1):
-                                            if isinstance(citation, dict):
-                                                title = citation.get("title", "N/A")
-                                                source = citation.get("source", "N/A")
-                                                url = citation.get("url", "")
-                                                markdown_content.append(f"{i}. **{title}**")
-                                                if source:
-                                                    markdown_content.append(f" - {source}")
-                                                if url:
-                                                    markdown_content.append(f" [Link]({url})")
-                                                markdown_content.append("\n")
-                                            elif isinstance(citation, str):
-                                                markdown_content.append(f"{i}. {citation}\n")
-                                        markdown_content.append("\n")
-                                        
-                                # Add metadata section
-                                markdown_content.append("## Metadata\n\n")
-                                markdown_content.append(f"- **Generated on:** {response_json.get('timestamp', 'N/A')}\n")
-                                markdown_content.append(f"- **Version:** {response_json.get('version', 'N/A')}\n")
-                                markdown_content.append(f"- **Response Type:** {response_json.get('type', 'N/A')}\n\n")
+                                # Render the report from the normalized response data
+                                markdown = render_report(build_report_context(response_json))
                                 
                                 # Write markdown to file
                                 response_md_file = output_dir / f"output_formatted_{timestamp}.md"
@@ -588,7 +555,7 @@ if __name__ == "__main__":
                                     json.dump(response_json, f, indent=2)
                                 
                                 with open(response_md_file, 'w') as f:
-                                    f.write("".join(markdown_content))
+                                    f.write(markdown)
                                 
                                 # Always write to the user-specified dengue_response.md file
                                 user_md_file = Path("/Users/wesjackson/Code/Summit2025/dengue-agents-summit-2025/dengue_response.md")
@@ -601,7 +568,7 @@ if __name__ == "__main__":
                                             f.write(response_json["response"])
                                         else:
                                             # Otherwise use the formatted markdown content
-                                            f.write("".join(markdown_content))
+                                            f.write(markdown)
                                     print(f"User output saved to: {user_md_file}")
                                 except Exception as e:
                                     print(f"Error writing to user output file: {str(e)}")
@@ -11,6 +11,8 @@ import json
 import httpx
 import logging
 import uuid
+import asyncio
+from contextlib import nullcontext
 from typing import Dict, List, Optional, Any, Tuple
 
 logger = logging.getLogger(__name__)
@@ -74,7 +76,8 @@ async def call_granite_instruct(
     messages: List[Dict[str, str]],
     max_tokens: int = 1024,
     temperature: float = 0.7,
-    tools: Optional[List[Dict]] = None
+    tools: Optional[List[Dict]] = None,
+    client: Optional[httpx.AsyncClient] = None
 ) -> ModelResponse:
     """
     Call the Granite Instruct model.
@@ -84,6 +87,7 @@ async def call_granite_instruct(
         max_tokens: Maximum number of tokens to generate
         temperature: Sampling temperature (0.0 to 1.0)
         tools: Optional list of tools to make available to the model
+        client: Optional HTTP client to reuse; a new one is created if omitted
         
     Returns:
         ModelResponse object with the model's response
@@ -130,11 +134,13 @@ async def call_granite_instruct(
         logger.debug(f"Calling Granite Instruct at {base_url}/v1/chat/completions with API key {masked_key}")
         
         # Make the API call
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
+        client_context = nullcontext(client) if client is not None else httpx.AsyncClient(timeout=30.0)
+        async with client_context as http_client:
+            response = await http_client.post(
                 f"{base_url}/v1/chat/completions",
                 headers=headers,
-                json=request_data
+                json=request_data,
+                timeout=30.0
             )
             
             # Handle response
@@ -186,7 +192,8 @@ async def call_granite_instruct(
 async def call_granite_guardian(
     messages: List[Dict[str, str]],
     max_tokens: int = 256,
-    temperature: float = 0.3
+    temperature: float = 0.3,
+    client: Optional[httpx.AsyncClient] = None
 ) -> ModelResponse:
     """
     Call the Granite Guardian model for content safety checking.
@@ -195,6 +202,7 @@ async def call_granite_guardian(
         messages: List of message dictionaries with 'role' and 'content' keys
         max_tokens: Maximum number of tokens to generate
         temperature: Sampling temperature (0.0 to 1.0)
+        client: Optional HTTP client to reuse; a new one is created if omitted
         
     Returns:
         ModelResponse object with the model's response
@@ -237,11 +245,13 @@ async def call_granite_guardian(
         logger.debug(f"Calling Granite Guardian at {base_url}/v1/chat/completions with API key {masked_key}")
         
         # Make the API call
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
+        client_context = nullcontext(client) if client is not None else httpx.AsyncClient(timeout=15.0)
+        async with client_context as http_client:
+            response = await http_client.post(
                 f"{base_url}/v1/chat/completions",
                 headers=headers,
-                json=request_data
+                json=request_data,
+                timeout=15.0
             )
             
             # Handle response
@@ -284,14 +294,44 @@ async def call_granite_guardian(
             processing_time_ms=int((time.time() - start_time) * 1000)
         )
 
+async def batch_call_granite_guardian(
+    messages_list: List[List[Dict[str, str]]],
+    max_tokens: int = 256,
+    temperature: float = 0.3,
+    client: Optional[httpx.AsyncClient] = None
+) -> List[ModelResponse]:
+    """
+    Call the Granite Guardian model for several conversations at once.
+    
+    All requests share one HTTP client and are sent concurrently, so they reuse
+    a single connection pool and the serving engine can batch them together.
+    
+    Args:
+        messages_list: One list of message dictionaries per conversation to check
+        max_tokens: Maximum number of tokens to generate per conversation
+        temperature: Sampling temperature (0.0 to 1.0)
+        client: Optional HTTP client to reuse; a new one is created if omitted
+        
+    Returns:
+        List of ModelResponse objects in the same order as messages_list
+    """
+    client_context = nullcontext(client) if client is not None else httpx.AsyncClient(timeout=15.0)
+    async with client_context as http_client:
+        return list(await asyncio.gather(*(
+            call_granite_guardian(messages, max_tokens=max_tokens, temperature=temperature, client=http_client)
+            for messages in messages_list
+        )))
+
 async def call_granite_embedding(
-    text: str
+    text: str,
+    client: Optional[httpx.AsyncClient] = None
 ) -> Tuple[Optional[List[float]], ModelResponse]:
     """
     Call the Granite Embedding model to generate embeddings for text.
     
     Args:
         text: The text to generate embeddings for
+        client: Optional HTTP client to reuse; a new one is created if omitted
         
     Returns:
         Tuple of (embedding vector, ModelResponse)
@@ -334,11 +374,13 @@ async def call_granite_embedding(
         logger.debug(f"Calling Granite Embedding at {base_url}/v1/embeddings with API key {masked_key}")
         
         # Make the API call
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
+        client_context = nullcontext(client) if client is not None else httpx.AsyncClient(timeout=15.0)
+        async with client_context as http_client:
+            response = await http_client.post(
                 f"{base_url}/v1/embeddings",
                 headers=headers,
-                json=request_data
+                json=request_data,
+                timeout=15.0
             )
             
             # Handle response
@@ -0,0 +1,87 @@
+"""
+On-disk cache for generated graph queries.
+
+The query generation test scripts run the same natural language questions over
+and over during development. This cache stores each generated result keyed by the
+agent configuration, model and question, so reruns can skip the LLM round-trip
+for questions that have already been answered.
+"""
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Default cache location, shared by all test scripts
+DEFAULT_CACHE_FILE = Path(
+    os.getenv("QUERY_CACHE_FILE", Path.home() / ".cache" / "dengue-agents" / "query_cache.json")
+)
+
+class QueryCache:
+    """Exact-match cache of generated queries persisted as a JSON file."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_FILE):
+        """
+        Initialize the cache, loading any existing entries from disk.
+
+        Args:
+            path: JSON file backing the cache
+        """
+        self.path = Path(path)
+        self._entries: Dict[str, Any] = {}
+        self._dirty = False
+
+        try:
+            self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable query cache {self.path}: {e}")
+
+    @staticmethod
+    def make_key(agent_config: Dict[str, Any], model_id: str, query: str, prompt_text: str = "") -> str:
+        """
+        Build the cache key for a query.
+
+        The agent config is serialized with sorted keys so that equivalent
+        configurations always produce the same key. The prompt text is part of
+        the key so that editing a prompt invalidates results generated with it.
+
+        Args:
+            agent_config: Configuration of the agent generating the query
+            model_id: Model used by the agent
+            query: Natural language query
+            prompt_text: Prompt template(s) used by the agent
+
+        Returns:
+            Hex digest identifying the query
+        """
+        config = json.dumps(agent_config, sort_keys=True)
+        prompt_digest = hashlib.sha256(prompt_text.encode()).hexdigest()
+        return hashlib.sha256(f"{config}|{model_id}|{prompt_digest}|{query}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for a key, or None if it isn't cached."""
+        return self._entries.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value; call save() to persist it."""
+        self._entries[key] = value
+        self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache to disk if it changed, replacing the file atomically."""
+        if not self._dirty:
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(self._entries), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save query cache {self.path}: {e}")